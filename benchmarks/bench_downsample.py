@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Downsampling Benchmark
+Times LTTB, min-max and min-max+LTTB on long synthetic price series, checks
+the vectorized LTTB against a straightforward per-point implementation, and
+measures what downsampling saves in a full chart render
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.chart_generator import QuickChartGenerator
+from src.downsample import downsample, lttb_indices
+
+
+def reference_lttb(data, threshold):
+    """Textbook LTTB with one Python iteration per input point"""
+    n = len(data)
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    selected = [0]
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(range(avg_start, avg_end)) / (avg_end - avg_start)
+        avg_y = sum(data[avg_start:avg_end]) / (avg_end - avg_start)
+
+        best_area, best = -1.0, None
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((a - avg_x) * (data[j] - data[a]) - (a - j) * (avg_y - data[a]))
+            if area > best_area:
+                best_area, best = area, j
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def envelope_coverage(original, reduced, columns):
+    """Share of each pixel column's price range (min..max) that the reduced series still spans"""
+    def envelope(series):
+        rows = np.array_split(np.asarray(series), columns)
+        return np.array([row.min() for row in rows]), np.array([row.max() for row in rows])
+
+    low, high = envelope(original)
+    reduced_low, reduced_high = envelope(np.interp(np.linspace(0, 1, len(original)),
+                                                   np.linspace(0, 1, len(reduced)), reduced))
+    spans = high - low
+    covered = np.minimum(high, reduced_high) - np.maximum(low, reduced_low)
+    return float(np.clip(covered, 0, None).sum() / spans.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=100_000, help='input series length')
+    parser.add_argument('--budget', type=int, default=800, help='output points (chart width in px)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per method')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    prices = 88000 * np.exp(np.cumsum(rng.normal(0, 0.0004, args.points)))
+    print(f"🧪 Downsampling {args.points:,} points to {args.budget}")
+
+    results = {'points': args.points, 'budget': args.budget, 'methods': {}}
+    for method in ('lttb', 'minmax', 'minmax-lttb'):
+        reduced, seconds = timed(lambda: downsample(prices, args.budget, method=method), args.repeat)
+        results['methods'][method] = {
+            'ms': round(seconds * 1000, 2),
+            'kept': len(reduced),
+            'envelope_coverage': round(envelope_coverage(prices, reduced, args.budget), 4),
+        }
+        print(f"📊 {method:<12} {seconds * 1000:8.2f} ms  kept={len(reduced)}  "
+              f"coverage={results['methods'][method]['envelope_coverage']:.1%}")
+
+    reference, reference_seconds = timed(lambda: reference_lttb(prices.tolist(), args.budget), 1)
+    matches = bool(np.array_equal(reference, lttb_indices(prices, args.budget)))
+    results['reference_lttb'] = {'ms': round(reference_seconds * 1000, 2), 'identical': matches}
+    print(f"📊 {'python lttb':<12} {reference_seconds * 1000:8.2f} ms  identical selection: {matches}")
+
+    # End to end: the chart stage with and without the pixel budget in front of it
+    chart_gen = QuickChartGenerator(backend='local')
+    series = prices.tolist()
+    renders = {}
+    for label, budget in (('downsampled', str(args.budget)), ('full', str(args.points))):
+        os.environ['CHART_MAX_POINTS'] = budget
+        _, seconds = timed(lambda: chart_gen.create_sparkline_chart(series, 'bitcoin', 1.0), 1)
+        renders[label] = round(seconds * 1000, 1)
+        print(f"🖼️ chart render ({label}): {seconds * 1000:.1f} ms")
+    os.environ.pop('CHART_MAX_POINTS')
+    results['chart_render_ms'] = renders
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    return matches
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Encode Profile Benchmark
+Measures videos/hour for each encode profile, one encode at a time and in
+throughput mode (several encodes in parallel with the cores split between them)
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.chart_renderer import LocalSparklineRenderer
+from src.encode_profiles import ENCODE_PROFILES, split_cores
+from src.video_composer import VideoComposer
+
+
+def make_inputs(work_dir, duration):
+    """Render a sample chart and a sine-tone narration stand-in"""
+    prices = 88000 + np.cumsum(np.random.default_rng(7).normal(0, 150, 168))
+    chart_config = {'data': {'datasets': [{
+        'data': prices.tolist(), 'borderColor': '#00ff88', 'backgroundColor': 'rgba(0, 255, 136, 0.1)',
+        'borderWidth': 4, 'fill': True, 'tension': 0.4, 'borderCapStyle': 'round'
+    }]}}
+    chart_path = os.path.join(work_dir, 'chart.png')
+    with open(chart_path, 'wb') as f:
+        f.write(LocalSparklineRenderer().render(chart_config, 800, 400))
+
+    audio_path = os.path.join(work_dir, 'narration.mp3')
+    subprocess.run(['ffmpeg', '-y', '-f', 'lavfi', '-i', f'sine=frequency=220:duration={duration}',
+                    '-c:a', 'libmp3lame', audio_path], check=True, capture_output=True)
+    return chart_path, audio_path
+
+
+def run_profile(composer, profile, jobs, parallel):
+    start = time.perf_counter()
+    outputs = composer.compose_many(jobs, profile=profile, parallel=parallel)
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for path in outputs if path)
+    sizes = [os.path.getsize(path) for path in outputs if path]
+    return {
+        'profile': profile,
+        'parallel': parallel,
+        'videos': succeeded,
+        'seconds': round(elapsed, 2),
+        'videos_per_hour': round(succeeded / elapsed * 3600, 1) if elapsed else 0,
+        'avg_bytes': int(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--videos', type=int, default=4, help='videos per measurement')
+    parser.add_argument('--duration', type=float, default=15, help='seconds of narration per video')
+    parser.add_argument('--profiles', default=','.join(ENCODE_PROFILES), help='comma separated profile names')
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    composer = VideoComposer()
+    if not composer.check_ffmpeg():
+        return False
+
+    cores = os.cpu_count() or 1
+    throughput_parallel, threads = split_cores()
+    print(f"🧪 Encode benchmark: {args.videos} x {args.duration:.0f}s videos, {cores} cores "
+          f"(throughput mode: {throughput_parallel} jobs x {threads} threads)")
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        composer.output_dir = work_dir
+        chart_path, audio_path = make_inputs(work_dir, args.duration)
+        background = {'type': 'solid', 'color': '#0a0a2a'}
+
+        for profile in args.profiles.split(','):
+            for parallel in sorted({1, throughput_parallel}):
+                jobs = [{
+                    'chart_path': chart_path, 'audio_path': audio_path, 'coin_name': 'bitcoin',
+                    'price_change': 1.0, 'duration': args.duration, 'background': background,
+                    'output_name': f"{profile}_{parallel}_{i}",
+                } for i in range(args.videos)]
+                result = run_profile(composer, profile, jobs, parallel)
+                results.append(result)
+                print(f"📊 {profile:<10} parallel={parallel:<2} {result['videos_per_hour']:>8.1f} videos/hour "
+                      f"({result['seconds']:.1f}s, avg {result['avg_bytes'] / 1024:.0f} KiB)")
+
+    report = {'cores': cores, 'videos': args.videos, 'duration': args.duration, 'results': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    return all(result['videos'] == args.videos for result in results)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+End-to-end Pipeline Benchmark
+Replays recorded fixtures through local stand-ins for CoinGecko, QuickChart
+and Edge TTS, then times each pipeline stage (fetch, chart, TTS, compose)
+over a range of batch sizes. No network access or API keys are needed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.chart_generator import QuickChartGenerator
+from src.coingecko_api import CoingeckoAPI
+from src.pipeline import VideoPipeline
+from src.tts_generator import TTSGenerator
+from src.video_composer import VideoComposer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+STAGES = ('fetch', 'chart', 'tts', 'compose')
+
+
+def load_fixtures():
+    """Read the recorded API responses, chart and narration clip"""
+    def read(name, mode='rb'):
+        with open(os.path.join(FIXTURES_DIR, name), mode) as f:
+            return f.read()
+
+    return {
+        'markets': json.loads(read('coins_markets.json', 'r')),
+        'market_chart': read('bitcoin_market_chart_7d.json'),
+        'chart_png': read('quickchart_sparkline.png'),
+        'tts_clip': os.path.join(FIXTURES_DIR, 'tts_clip.mp3'),
+    }
+
+
+class FixtureServer:
+    """
+    Local HTTP stand-in for the CoinGecko and QuickChart endpoints the
+    pipeline calls, with an optional per-request latency to mimic the network
+    """
+
+    def __init__(self, fixtures, latency=0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        bench = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                bench.requests += 1
+                if bench.latency:
+                    time.sleep(bench.latency)
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+                if url.path == '/api/v3/coins/markets':
+                    per_page = int(query.get('per_page', 100))
+                    page = int(query.get('page', 1))
+                    markets = bench.fixtures['markets'][(page - 1) * per_page:page * per_page]
+                    self._send(json.dumps(markets).encode(), 'application/json')
+                elif url.path.startswith('/api/v3/coins/') and url.path.endswith('/market_chart'):
+                    self._send(bench.fixtures['market_chart'], 'application/json')
+                elif url.path == '/chart':
+                    self._send(bench.fixtures['chart_png'], 'image/png')
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                bench.requests += 1
+                if bench.latency:
+                    time.sleep(bench.latency)
+                # Large chart configs are POSTed to QuickChart instead of sent in the query string
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if urlparse(self.path).path == '/chart':
+                    self._send(bench.fixtures['chart_png'], 'image/png')
+                else:
+                    self.send_error(404)
+
+            def _send(self, body, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class FixtureCommunicate:
+    """Edge TTS stand-in: waits out the synthesis latency, then writes the recorded clip"""
+
+    def __init__(self, clip_path, latency, text, voice):
+        self.clip_path = clip_path
+        self.latency = latency
+
+    async def save(self, path):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        shutil.copyfile(self.clip_path, path)
+
+
+def percentile(samples, q):
+    return round(float(np.percentile(samples, q)), 4) if samples else None
+
+
+def stage_stats(samples):
+    return {
+        'count': len(samples),
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'mean': round(float(np.mean(samples)), 4) if samples else None,
+    }
+
+
+def peak_rss_mib(who):
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    maxrss = resource.getrusage(who).ru_maxrss
+    return round(maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_batch(args, server_url, fixtures, batch_size, work_dir):
+    """Run one batch through a freshly built pipeline and collect its stage timings"""
+    # Artifacts are named by content, so a run sharing directories with an
+    # earlier one would time file reuse; each run writes into its own
+    run_dir = tempfile.mkdtemp(prefix=f"batch{batch_size}_", dir=work_dir)
+    for env_name in ('OUTPUT_DIR', 'AUDIO_DIR', 'CHARTS_DIR'):
+        os.environ[env_name] = os.path.join(run_dir, env_name.split('_')[0].lower())
+        os.makedirs(os.environ[env_name])
+
+    coingecko = CoingeckoAPI(cache=False)
+    coingecko.base_url = f"{server_url}/api/v3"
+    chart_gen = QuickChartGenerator(backend=args.chart_backend)
+    tts = TTSGenerator(
+        communicate_factory=lambda text, voice: FixtureCommunicate(fixtures['tts_clip'], args.tts_latency, text, voice),
+        cache=False,
+    )
+    pipeline = VideoPipeline(coingecko=coingecko, chart_gen=chart_gen, tts=tts,
+                             video_composer=VideoComposer(), encode_profile=args.profile)
+
+    jobs = [{'video_type': 'bitcoin' if i % 2 == 0 else 'gainers'} for i in range(batch_size)]
+    start = time.perf_counter()
+    # The pipeline fetches the shared market snapshot once before fanning out;
+    # warm it here so that request shows up as its own fetch sample
+    coingecko.get_market_snapshot()
+    snapshot_seconds = time.perf_counter() - start
+    results = pipeline.run_sync(jobs)
+    elapsed = time.perf_counter() - start
+
+    samples = {stage: [r['timings'][stage] for r in results if stage in r['timings']] for stage in STAGES}
+    samples['snapshot'] = [snapshot_seconds]
+    samples['job'] = [r['seconds'] for r in results if r['success']]
+    succeeded = sum(1 for r in results if r['success'])
+    return {
+        'batch_size': batch_size,
+        'succeeded': succeeded,
+        'seconds': round(elapsed, 3),
+        'videos_per_hour': round(succeeded / elapsed * 3600, 1) if elapsed else 0,
+        'stages': {stage: stage_stats(values) for stage, values in samples.items()},
+        'peak_rss_mib': peak_rss_mib(resource.RUSAGE_SELF),
+        'peak_child_rss_mib': peak_rss_mib(resource.RUSAGE_CHILDREN),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-sizes', default='1,2,4', help='comma separated batch sizes')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per batch size')
+    parser.add_argument('--chart-backend', default='local', choices=('local', 'quickchart'),
+                        help='render locally or fetch the recorded PNG from the QuickChart stand-in')
+    parser.add_argument('--profile', default='throughput', help='encode profile for the compose stage')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='seconds added to every HTTP response')
+    parser.add_argument('--tts-latency', type=float, default=0.8, help='seconds each TTS synthesis takes')
+    parser.add_argument('--json', help='write results to this file instead of stdout')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as work_dir, FixtureServer(fixtures, args.api_latency) as server:
+        os.environ['BACKGROUNDS_DIR'] = os.path.join(work_dir, 'backgrounds')
+        os.makedirs(os.environ['BACKGROUNDS_DIR'], exist_ok=True)
+        # Pre-rendered backgrounds too, even when .env places the library elsewhere
+        os.environ['BACKGROUND_LIBRARY_DIR'] = os.path.join(os.environ['BACKGROUNDS_DIR'], 'library')
+        os.environ['QUICKCHART_BASE_URL'] = f"{server.base_url}/chart"
+
+        print(f"🧪 Pipeline benchmark: batches {batch_sizes} x{args.repeat}, chart={args.chart_backend}, "
+              f"profile={args.profile}, {os.cpu_count() or 1} cores")
+        runs = []
+        for batch_size in batch_sizes:
+            for _ in range(args.repeat):
+                run = run_batch(args, server.base_url, fixtures, batch_size, work_dir)
+                runs.append(run)
+                stages = ', '.join(f"{stage} p50={run['stages'][stage]['p50']}s" for stage in STAGES)
+                print(f"📊 batch={batch_size:<3} {run['videos_per_hour']:>8.1f} videos/hour "
+                      f"({run['seconds']:.1f}s; {stages}; peak RSS {run['peak_rss_mib']} MiB)")
+        http_requests = server.requests
+
+    report = {
+        'cores': os.cpu_count() or 1,
+        'chart_backend': args.chart_backend,
+        'profile': args.profile,
+        'api_latency': args.api_latency,
+        'tts_latency': args.tts_latency,
+        'http_requests': http_requests,
+        'runs': runs,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    else:
+        print(json.dumps(report, indent=2))
+    return all(run['succeeded'] == run['batch_size'] for run in runs)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
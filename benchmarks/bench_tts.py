@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+TTS Concurrency Benchmark
+Runs TTSGenerator.generate_many against a stubbed synthesizer (no Edge TTS,
+no network) at several concurrency levels, and checks the concurrent path:
+results come back in input order, no more than `concurrency` requests are
+in flight, a failing request is retried, a hanging one times out, and a
+rerun is served from the TTS cache without synthesizing again.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.tts_cache import TTSCache
+from src.tts_generator import TTSGenerator
+
+TTS_CLIP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'tts_clip.mp3')
+
+
+class StubSynthesizer:
+    """
+    communicate_factory stand-in: every request waits out `latency` and then
+    writes the recorded clip. Texts starting with 'flaky' fail their first
+    attempt and texts starting with 'hang' never finish.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def __call__(self, text, voice):
+        return StubCommunicate(self, text)
+
+
+class StubCommunicate:
+    def __init__(self, synthesizer, text):
+        self.synthesizer = synthesizer
+        self.text = text
+
+    async def save(self, path):
+        stub = self.synthesizer
+        stub.calls[self.text] = stub.calls.get(self.text, 0) + 1
+        stub.in_flight += 1
+        stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+        try:
+            if self.text.startswith('hang'):
+                await asyncio.sleep(3600)
+            # Later items finish first, so gather order is what keeps results in input order
+            await asyncio.sleep(stub.latency * (1 + 1 / (1 + len(stub.calls))))
+            if self.text.startswith('flaky') and stub.calls[self.text] == 1:
+                raise ConnectionError('stub: dropped connection')
+            shutil.copyfile(TTS_CLIP, path)
+        finally:
+            stub.in_flight -= 1
+
+
+def run_generate_many(work_dir, cache, items, latency, **kwargs):
+    """Run generate_many on a fresh audio dir, returning (paths, seconds, synthesizer)"""
+    os.environ['AUDIO_DIR'] = tempfile.mkdtemp(prefix='audio_', dir=work_dir)
+    synthesizer = StubSynthesizer(latency)
+    tts = TTSGenerator(communicate_factory=synthesizer, cache=cache)
+    start = time.perf_counter()
+    paths = asyncio.run(tts.generate_many(items, **kwargs))
+    return paths, time.perf_counter() - start, synthesizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=16, help='clips per run')
+    parser.add_argument('--concurrency', default='1,4,8', help='comma separated concurrency levels')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds each stubbed synthesis takes')
+    parser.add_argument('--json', help='write results to this file instead of stdout')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    items = [(f"Price update number {i}", None, f"clip_{i}.mp3") for i in range(args.items)]
+    results = {'items': args.items, 'latency': args.latency, 'runs': [], 'checks': {}}
+    checks = results['checks']
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for concurrency in levels:
+            paths, seconds, stub = run_generate_many(work_dir, False, items, args.latency,
+                                                     concurrency=concurrency, retries=0)
+            in_order = [os.path.basename(path) if path else None for path in paths] == \
+                [filename for _, _, filename in items]
+            results['runs'].append({
+                'concurrency': concurrency,
+                'seconds': round(seconds, 3),
+                'clips_per_second': round(args.items / seconds, 1),
+                'peak_in_flight': stub.peak_in_flight,
+                'in_order': in_order,
+            })
+            checks[f"order_c{concurrency}"] = in_order
+            checks[f"bounded_c{concurrency}"] = stub.peak_in_flight <= concurrency
+            print(f"📊 concurrency={concurrency:<3} {seconds:6.2f}s  {args.items / seconds:6.1f} clips/s  "
+                  f"peak in flight={stub.peak_in_flight}")
+
+        # A dropped connection is retried; a request that never answers times out
+        edge_items = [('flaky sentence', None, 'flaky.mp3'), ('hang sentence', None, 'hang.mp3')]
+        paths, _, stub = run_generate_many(work_dir, False, edge_items, args.latency,
+                                           timeout=args.latency * 5, retries=1, backoff=0.01)
+        checks['retry'] = paths[0] is not None and stub.calls['flaky sentence'] == 2
+        checks['timeout'] = paths[1] is None and stub.calls['hang sentence'] == 2
+
+        # Same sentences again on an empty audio dir: every clip comes from the cache
+        cache = TTSCache(cache_dir=os.path.join(work_dir, 'tts_cache'))
+        run_generate_many(work_dir, cache, items, args.latency, concurrency=max(levels))
+        paths, seconds, stub = run_generate_many(work_dir, cache, items, args.latency, concurrency=max(levels))
+        checks['cache_reuse'] = all(paths) and not stub.calls
+        print(f"♻️ cached rerun: {seconds:.2f}s, {sum(stub.calls.values())} syntheses")
+
+    for name, passed in checks.items():
+        print(f"{'✅' if passed else '❌'} {name}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    else:
+        print(json.dumps(results, indent=2))
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
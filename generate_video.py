@@ -102,7 +102,7 @@ def generate_top_gainers_video():
         return False
     
     # Generate video using the video composer
-    video_path = video_composer.create_top_gainers_video(gainers, duration=15)
+    video_path = video_composer.create_top_gainers_video(gainers, duration=15, coingecko=coingecko)
     
     if video_path:
         print(f"🎉 Top gainers video generated: {video_path}")
@@ -111,6 +111,29 @@ def generate_top_gainers_video():
         print("❌ Failed to generate top gainers video")
         return False
 
+def generate_gainers_roundup(count=5):
+    """Generate one roundup video covering the top gainers"""
+    print(f"🚀 Starting Top {count} Gainers Roundup...")
+    
+    coingecko = CoingeckoAPI()
+    video_composer = VideoComposer()
+    
+    print("📊 Fetching top gainers...")
+    gainers = coingecko.get_top_gainers(limit=count)
+    
+    if not gainers:
+        print("❌ Failed to fetch top gainers")
+        return False
+    
+    video_path = video_composer.create_top_gainers_roundup(gainers, count=count, coingecko=coingecko)
+    
+    if video_path:
+        print(f"🎉 Gainers roundup generated: {video_path}")
+        return True
+    else:
+        print("❌ Failed to generate gainers roundup")
+        return False
+
 def main():
     """Main function with video type selection"""
     if len(sys.argv) > 1:
@@ -124,6 +147,9 @@ def main():
         success = generate_bitcoin_video()
     elif video_type == "gainers":
         success = generate_top_gainers_video()
+    elif video_type == "roundup":
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+        success = generate_gainers_roundup(count)
     elif video_type == "all":
         print("🔄 Generating both Bitcoin and Top Gainers videos...")
         success1 = generate_bitcoin_video()
@@ -131,7 +157,7 @@ def main():
         success = success1 and success2
     else:
         print(f"❌ Unknown video type: {video_type}")
-        print("Available options: bitcoin, gainers, all")
+        print("Available options: bitcoin, gainers, roundup, all")
         return False
     
     if success:
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Freshness windows per logical endpoint, in seconds: (ttl, stale-while-revalidate window)
+DEFAULT_TTLS = {
+    'coins/markets': (120, 600),
+    'coins/market_chart': (900, 3600),
+    'simple/price': (60, 300),
+}
+FALLBACK_TTL = (300, 900)
+
+
+class ResponseCache:
+    """
+    Persistent content-addressed cache for JSON API responses.
+
+    Entries live in a SQLite file keyed by a hash of endpoint + params, so
+    separate processes (batch workers, repeated CI jobs) share them. Fresh
+    entries are served directly, stale ones are served while a background
+    refresh runs, and the least recently used entries are evicted once the
+    cache grows past its size budget.
+    """
+
+    def __init__(self, path=None, max_bytes=None, ttls=None):
+        self.path = path or os.getenv('API_CACHE_PATH', './assets/cache/api_cache.sqlite3')
+        self.max_bytes = max_bytes or int(os.getenv('API_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY, endpoint TEXT, body BLOB, size INTEGER,'
+            ' fetched_at REAL, accessed_at REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(endpoint, params):
+        """Hash an endpoint and its params into a stable cache key"""
+        payload = json.dumps({'endpoint': endpoint, 'params': params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Return (value, age_seconds) for a cached entry, or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT body, fetched_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+        body, fetched_at = row
+        return json.loads(body), time.time() - fetched_at
+
+    def set(self, key, endpoint, value):
+        """Store a value and evict old entries if the cache is over budget"""
+        body = json.dumps(value).encode('utf-8')
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, endpoint, body, size, fetched_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (key, endpoint, body, len(body), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT key, size FROM entries ORDER BY accessed_at').fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany('DELETE FROM entries WHERE key = ?', doomed)
+
+    def fetch(self, endpoint, params, loader):
+        """
+        Serve endpoint+params from the cache, calling loader() on a miss.
+
+        Within the TTL the cached value is returned as-is; within the stale
+        window it is returned immediately and refreshed in the background.
+        If loader() raises and any cached copy exists, that copy is served.
+        """
+        ttl, stale = self.ttls.get(endpoint, FALLBACK_TTL)
+        key = self.make_key(endpoint, params)
+        cached = self.get(key)
+
+        if cached is not None:
+            value, age = cached
+            if age < ttl:
+                return value
+            if age < ttl + stale:
+                self._refresh_in_background(key, endpoint, loader)
+                return value
+
+        try:
+            value = loader()
+        except Exception:
+            if cached is not None:
+                print(f"⚠️ Serving stale {endpoint} response ({cached[1]:.0f}s old)")
+                return cached[0]
+            raise
+        self.set(key, endpoint, value)
+        return value
+
+    def _refresh_in_background(self, key, endpoint, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, endpoint, loader())
+            except Exception as e:
+                print(f"⚠️ Background refresh of {endpoint} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._conn.execute('DELETE FROM entries')
+            self._conn.commit()
+
+
+def cache_enabled():
+    """Whether the API response cache is turned on (API_CACHE_ENABLED, default on)"""
+    return os.getenv('API_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import uuid
+
+# Generated charts, narration and videos are named after a hash of what they
+# are built from, so identical inputs map to the same file: finished work is
+# found by name and skipped, and concurrent workers can't collide the way
+# second-resolution timestamps did. Files are written under a private
+# partial name and renamed into place, so a reader never sees half a file.
+
+
+def content_key(*parts, length=16):
+    """Short stable hash of anything JSON-serializable"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:length]
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def partial_path(path):
+    """
+    Temporary name next to `path`, unique per call: two writers of the same
+    artifact (even coroutines on one event loop) never share a partial file.
+    The extension is kept so tools that pick a format from it (FFmpeg) still can
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.{uuid.uuid4().hex}.part{ext}"
+
+
+def write_atomic(path, data):
+    """Write bytes to path through a partial file and a rename"""
+    tmp_path = partial_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def mark_used(output):
+    """
+    Bump the mtime of a reused artifact (a path, a list of paths or a
+    {format: path} dict), so retention in src/asset_gc.py ages files by
+    their last use rather than by when they were first written
+    """
+    paths = output.values() if isinstance(output, dict) else [output] if isinstance(output, str) else output
+    for path in paths:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,283 @@
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+from src.job_journal import JobJournal, journal_enabled
+
+load_dotenv()
+
+DAY = 86400
+
+# Retention per managed directory: (directory env var, default directory,
+# max age in days, max files, max bytes). Any limit set to 0 is disabled and
+# can be overridden with ASSET_GC_<NAME>_MAX_AGE_DAYS / _MAX_FILES / _MAX_BYTES.
+DEFAULT_POLICIES = {
+    'charts': ('CHARTS_DIR', './assets/charts', 7, 2000, 512 * 1024 * 1024),
+    'audio': ('AUDIO_DIR', './assets/audio', 7, 2000, 512 * 1024 * 1024),
+    'output': ('OUTPUT_DIR', './assets/output', 30, 500, 8 * 1024 * 1024 * 1024),
+}
+
+# Sidecar files that live and die with their video
+COMPANION_SUFFIX = '_metadata.txt'
+
+
+def load_policies():
+    """Retention policies from DEFAULT_POLICIES and the ASSET_GC_* overrides"""
+    policies = {}
+    for name, (dir_var, default_dir, max_age_days, max_files, max_bytes) in DEFAULT_POLICIES.items():
+        prefix = f"ASSET_GC_{name.upper()}"
+        policies[name] = {
+            'directory': os.getenv(dir_var, default_dir),
+            'max_age_days': float(os.getenv(f"{prefix}_MAX_AGE_DAYS", max_age_days)),
+            'max_files': int(os.getenv(f"{prefix}_MAX_FILES", max_files)),
+            'max_bytes': int(os.getenv(f"{prefix}_MAX_BYTES", max_bytes)),
+        }
+    return policies
+
+
+class AssetGC:
+    """
+    Retention and disk-budget garbage collector for generated assets.
+
+    Charts, narration and videos are only ever added (and, being named by
+    content, are reused across runs), so each managed directory gets an
+    age/count/size policy and all of them share one disk budget. Files are
+    tracked in a SQLite index that is only refreshed for directories whose
+    mtime changed since the last run, and only files new to the index are
+    stat'ed. Ages count from last use: reused artifacts get their mtime
+    bumped (src/artifacts.mark_used) and every deletion candidate is
+    re-stat'ed first. Collection deletes the least recently used files first
+    and never touches:
+
+    - artifacts the job journal still needs: stages and videos of jobs
+      (running, pending, failed or done) updated within `protect_hours`,
+      whose batch may still be resumed; older journal rows are pruned
+    - files younger than `min_age` seconds, which may belong to a run that
+      isn't journaled
+    - partial files of writes in flight (orphans older than a day are removed)
+    """
+
+    def __init__(self, index_path=None, policies=None, budget_bytes=None, journal=None,
+                 protect_hours=None, min_age=None):
+        self.index_path = index_path or os.getenv('ASSET_INDEX_PATH', './assets/cache/assets.sqlite3')
+        self.policies = policies or load_policies()
+        self.budget_bytes = budget_bytes or int(os.getenv('ASSET_GC_BUDGET_BYTES', 10 * 1024 * 1024 * 1024))
+        if journal is None and journal_enabled():
+            journal = JobJournal()
+        self.journal = journal
+        self.protect_hours = float(os.getenv('ASSET_GC_PROTECT_HOURS', 24)) if protect_hours is None \
+            else protect_hours
+        self.min_age = int(os.getenv('ASSET_GC_MIN_AGE_SECONDS', 3600)) if min_age is None else min_age
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS dirs (directory TEXT PRIMARY KEY, mtime_ns INTEGER)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            ' path TEXT PRIMARY KEY, area TEXT, bytes INTEGER, mtime REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS files_area_mtime ON files (area, mtime)')
+        self._conn.commit()
+
+    def refresh(self):
+        """
+        Bring the index up to date, returning how many directories were rescanned.
+        Unchanged directories cost one stat; changed ones a listing plus a stat per new file.
+        """
+        rescanned = 0
+        with self._lock:
+            for area, policy in self.policies.items():
+                directory = os.path.abspath(policy['directory'])
+                try:
+                    # Read before listing: a file added mid-scan changes it again
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                row = self._conn.execute('SELECT mtime_ns FROM dirs WHERE directory = ?', (directory,)).fetchone()
+                if row and row[0] == mtime_ns:
+                    continue
+                self._scan(area, directory)
+                self._conn.execute('INSERT OR REPLACE INTO dirs (directory, mtime_ns) VALUES (?, ?)',
+                                   (directory, mtime_ns))
+                rescanned += 1
+            self._conn.commit()
+        return rescanned
+
+    def _scan(self, area, directory):
+        names = set(os.listdir(directory))
+        indexed = {path for (path,) in self._conn.execute('SELECT path FROM files WHERE area = ?', (area,))}
+        listed = {os.path.join(directory, name) for name in names}
+        self._conn.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in indexed - listed])
+
+        rows = []
+        for path in listed - indexed:
+            # Sidecars are accounted with their video
+            if path.endswith(COMPANION_SUFFIX) and os.path.basename(_main_file(path)) in names:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            rows.append((path, area, _disk_bytes(path, stat), stat.st_mtime))
+        self._conn.executemany('INSERT OR REPLACE INTO files (path, area, bytes, mtime) VALUES (?, ?, ?, ?)', rows)
+
+    def protected(self):
+        """Absolute paths collection must keep"""
+        if not self.journal:
+            return set()
+        since = time.time() - self.protect_hours * 3600
+        return {os.path.abspath(path) for path in self.journal.referenced_artifacts(since)}
+
+    def plan(self, now=None):
+        """
+        Decide what to delete, returning (doomed paths, stats per area); nothing is removed
+        """
+        now = now or time.time()
+        self.refresh()
+        protected = self.protected()
+        with self._lock:
+            rows = [row for row in self._conn.execute('SELECT path, area, bytes, mtime FROM files ORDER BY mtime')
+                    if row[1] in self.policies]
+        refreshed = []
+
+        def removable(path, size, mtime):
+            """The bytes deleting `path` frees now, or None when it must be kept"""
+            if '.part' in os.path.basename(path):
+                # A write in flight, or one that died: only orphans are collected
+                return size if now - mtime > DAY else None
+            if path in protected or now - mtime <= self.min_age:
+                return None
+            # Only candidates are stat'ed: a file replaced under the same name
+            # (explicit output names) or reused since is newer than the index
+            # says, and a clip whose TTS cache copy was evicted now owns its bytes
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return 0
+            current = _disk_bytes(path, stat)
+            if stat.st_mtime != mtime or current != size:
+                refreshed.append((current, stat.st_mtime, path))
+            return current if stat.st_mtime == mtime else None
+
+        doomed = {}
+        stats = {}
+        for area, policy in self.policies.items():
+            files = [row for row in rows if row[1] == area]
+            kept_bytes = sum(row[2] for row in files)
+            kept_files = len(files)
+            for path, _, size, mtime in files:  # oldest first
+                expired = policy['max_age_days'] and now - mtime > policy['max_age_days'] * DAY
+                over_count = policy['max_files'] and kept_files > policy['max_files']
+                over_size = policy['max_bytes'] and kept_bytes > policy['max_bytes']
+                partial = '.part' in os.path.basename(path)
+                if not (expired or over_count or over_size or partial):
+                    continue
+                freed = removable(path, size, mtime)
+                if freed is not None:
+                    doomed[path] = freed
+                    kept_bytes -= size
+                    kept_files -= 1
+            stats[area] = {'files': kept_files, 'bytes': kept_bytes}
+
+        # Shared budget: oldest first across every area. Hardlinked files count
+        # as 0 bytes, so the budget only ever counts on space a delete returns
+        total = sum(area_stats['bytes'] for area_stats in stats.values())
+        for path, area, size, mtime in rows:
+            if total <= self.budget_bytes:
+                break
+            if path in doomed or not size:
+                continue
+            freed = removable(path, size, mtime)
+            if freed is not None:
+                doomed[path] = freed
+                stats[area]['files'] -= 1
+                stats[area]['bytes'] -= size
+                total -= size
+
+        if refreshed:
+            with self._lock:
+                self._conn.executemany('UPDATE files SET bytes = ?, mtime = ? WHERE path = ?', refreshed)
+                self._conn.commit()
+        return doomed, stats
+
+    def collect(self, dry_run=False):
+        """
+        Apply the retention policies and disk budget, returning a summary dict
+        """
+        started = time.perf_counter()
+        doomed, stats = self.plan()
+        removed = []
+        if not dry_run and self.journal:
+            # Jobs past the protection window can't pin artifacts anymore; forget them
+            self.journal.prune(time.time() - self.protect_hours * 3600)
+        if not dry_run:
+            for path in doomed:
+                for target in (path, _companion(path)):
+                    if not target:
+                        continue
+                    try:
+                        os.remove(target)
+                    except FileNotFoundError:
+                        pass
+                removed.append(path)
+            with self._lock:
+                self._conn.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in removed])
+                self._conn.commit()
+
+        freed = sum(doomed.values())
+        verb = 'Would free' if dry_run else 'Freed'
+        kept = ', '.join(f"{area} {area_stats['files']} files / {area_stats['bytes'] / 1024 / 1024:.1f} MB"
+                         for area, area_stats in stats.items())
+        print(f"🧹 {verb} {freed / 1024 / 1024:.1f} MB in {len(doomed)} files (kept: {kept})")
+        return {
+            'dry_run': dry_run,
+            'files_removed': len(doomed),
+            'bytes_freed': freed,
+            'kept': stats,
+            'budget_bytes': self.budget_bytes,
+            'seconds': round(time.perf_counter() - started, 3),
+            'removed': sorted(doomed),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def _disk_bytes(path, stat):
+    """
+    Bytes deleting a file (and its sidecar) gives back. Narration clips are
+    hardlinks into the TTS cache (src/tts_cache.py); while the cache holds
+    another link, removing the clip frees nothing.
+    """
+    size = stat.st_size if stat.st_nlink <= 1 else 0
+    companion = _companion(path)
+    if companion:
+        try:
+            size += os.path.getsize(companion)
+        except FileNotFoundError:
+            pass
+    return size
+
+
+def _companion(path):
+    """The sidecar deleted together with a video, or None"""
+    if path.endswith('.mp4'):
+        return path[:-len('.mp4')] + COMPANION_SUFFIX
+    return None
+
+
+def _main_file(companion_path):
+    return companion_path[:-len(COMPANION_SUFFIX)] + '.mp4'
+
+
+def gc_after_batch_enabled():
+    """Whether batch runs collect assets once they finish (BATCH_GC_ENABLED, default off)"""
+    return os.getenv('BATCH_GC_ENABLED', 'false').lower() not in ('0', 'false', 'no')
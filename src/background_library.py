@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+
+from src.artifacts import file_sha256
+from src.encode_profiles import content_tune, encode_args, split_cores
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+load_dotenv()
+
+
+class BackgroundLibrary:
+    """
+    Pre-rendered background clips, one per (template, resolution, duration, fps).
+
+    Variants are keyed on a hash of the template config and render settings,
+    so editing a template's colors produces a new variant instead of serving
+    a stale one. index.json maps each key to its file, size and SHA-256
+    content hash; compose looks a variant up by key and only falls back to
+    generating the background inside its own filter graph when none exists.
+    """
+
+    def __init__(self, video_composer, root=None, profile=None):
+        self.video_composer = video_composer
+        # Follows BACKGROUNDS_DIR unless BACKGROUND_LIBRARY_DIR places it elsewhere
+        self.root = root or os.getenv('BACKGROUND_LIBRARY_DIR') or \
+            os.path.join(os.getenv('BACKGROUNDS_DIR', './assets/backgrounds'), 'library')
+        # Backgrounds are re-encoded by every compose, so they are stored at upload quality
+        self.profile = profile or os.getenv('BACKGROUND_LIBRARY_PROFILE', 'publish')
+        self.index_path = os.path.join(self.root, 'index.json')
+        # index.json is swapped by rename, so processes lock this file instead
+        self.lock_path = self.index_path + '.lock'
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def variant_key(background, size, duration, fps=30):
+        """Stable key for a background config rendered at size (w, h), duration and fps"""
+        spec = json.dumps({'background': background, 'size': list(size), 'duration': duration, 'fps': fps},
+                          sort_keys=True)
+        return hashlib.sha256(spec.encode('utf-8')).hexdigest()[:16]
+
+    def load_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_entry(self, key, entry):
+        # Re-read under the lock so variants rendered by other processes are kept
+        with self._lock, open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                # Serializes batch worker processes rendering different variants
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = self.load_index()
+                index[key] = entry
+                fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(index, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.index_path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, background, duration, fps=30, size=None):
+        """
+        Path of the pre-rendered variant, or None when it hasn't been rendered (or its file is gone)
+        """
+        size = size or (self.video_composer.width, self.video_composer.height)
+        entry = self.load_index().get(self.variant_key(background, size, duration, fps))
+        if not entry:
+            return None
+        path = os.path.join(self.root, entry['file'])
+        try:
+            if os.path.getsize(path) != entry['bytes']:
+                return None
+        except FileNotFoundError:
+            return None
+        return path
+
+    def render(self, name, background, duration, fps=30, size=None, threads=None):
+        """
+        Render one variant to the library (a no-op when it already exists), returning its path or None
+        """
+        size = size or (self.video_composer.width, self.video_composer.height)
+        existing = self.get(background, duration, fps, size)
+        if existing:
+            return existing
+
+        source = self.video_composer.background_source(background, duration, fps, size=size)
+        if not source:
+            print(f"⚠️ Background template {name} has no renderable source")
+            return None
+
+        key = self.variant_key(background, size, duration, fps)
+        filename = f"{name}_{size[0]}x{size[1]}_{duration}s_{fps}fps_{key}.mp4"
+        path = os.path.join(self.root, filename)
+        cmd = [
+            'ffmpeg', '-y',
+            '-f', 'lavfi', '-i', source,
+            *encode_args(self.profile, threads,
+                         content_tune(self.profile, self.video_composer.background_animated(background))),
+            '-t', str(duration),
+            '-an',
+            path
+        ]
+        try:
+            # run_ffmpeg renames the finished file into place, so get() never sees a partial one
+            self.video_composer.run_ffmpeg(cmd, 'background', path, background=name,
+                                           size=f"{size[0]}x{size[1]}")
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Error rendering background {name}: {e}")
+            return None
+
+        self._save_entry(key, {
+            'template': name,
+            'config': background,
+            'width': size[0],
+            'height': size[1],
+            'duration': duration,
+            'fps': fps,
+            'file': filename,
+            'bytes': os.path.getsize(path),
+            'sha256': file_sha256(path),
+            'created': datetime.now().isoformat(),
+        })
+        return path
+
+    def prerender(self, templates, durations=(15,), fps=30, sizes=None, parallel=None):
+        """
+        Render every missing (template, size, duration) variant, several at a time.
+
+        `templates` is a {name: background config} dict such as
+        TemplateManager.templates['backgrounds']. Returns {name: [paths]}.
+        """
+        sizes = sizes or [(self.video_composer.width, self.video_composer.height)]
+        variants = [(name, config, duration, size)
+                    for name, config in templates.items()
+                    for size in sizes
+                    for duration in durations]
+        missing = [variant for variant in variants if not self.get(variant[1], variant[2], fps, variant[3])]
+        if missing:
+            parallel, threads = split_cores(parallel)
+            print(f"🎞️ Pre-rendering {len(missing)} background variants, {parallel} at a time...")
+            with ThreadPoolExecutor(parallel) as pool:
+                list(pool.map(lambda v: self.render(v[0], v[1], v[2], fps, v[3], threads=threads), missing))
+
+        rendered = {}
+        for name, config, duration, size in variants:
+            path = self.get(config, duration, fps, size)
+            if path:
+                rendered.setdefault(name, []).append(path)
+        return rendered
+
+    def verify(self):
+        """
+        Re-hash every indexed file, returning the keys whose content no longer matches
+        """
+        return [key for key, entry in self.load_index().items()
+                if not os.path.exists(os.path.join(self.root, entry['file']))
+                or file_sha256(os.path.join(self.root, entry['file'])) != entry['sha256']]
+
+
+def background_prerender_enabled():
+    """Whether batch runs pre-render missing template backgrounds first (BACKGROUND_PRERENDER, default on)"""
+    return os.getenv('BACKGROUND_PRERENDER', 'true').lower() not in ('0', 'false', 'no')
@@ -0,0 +1,239 @@
+import csv
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from dotenv import load_dotenv
+
+from src.artifacts import mark_used
+from src.asset_gc import AssetGC, gc_after_batch_enabled
+from src.background_library import background_prerender_enabled
+from src.encode_profiles import split_cores
+from src.job_journal import JobJournal, journal_enabled
+
+load_dotenv()
+
+# Manifest columns / keys understood per job ('coin' is accepted for coin_id)
+JOB_FIELDS = ('video_type', 'coin_id', 'rank', 'background', 'voice', 'chart_style', 'name')
+
+# One pipeline per worker process, built by _init_worker
+_pipeline = None
+
+
+def load_manifest(path):
+    """
+    Read batch jobs from a JSON manifest (a list of jobs or {"jobs": [...]})
+    or a CSV one with a header row of JOB_FIELDS
+    """
+    with open(path, newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            data = json.load(f)
+            rows = data['jobs'] if isinstance(data, dict) else data
+    return [normalize_job(row, line) for line, row in enumerate(rows, start=1)]
+
+
+def normalize_job(row, line=None):
+    """
+    Turn a manifest row into a pipeline job, dropping empty cells and
+    flattening a nested "templates" object into the job's override keys
+    """
+    where = f" (job {line})" if line else ''
+    fields = dict(row)
+    fields.update(fields.pop('templates', None) or {})
+
+    job = {}
+    for key, value in fields.items():
+        key = (key or '').strip().lower()
+        key = 'coin_id' if key == 'coin' else key
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if key not in JOB_FIELDS:
+            raise ValueError(f"Unknown manifest field '{key}'{where}")
+        job[key] = value.strip() if isinstance(value, str) else value
+
+    # A bare coin means a coin focus video
+    job.setdefault('video_type', 'coin' if 'coin_id' in job else None)
+    if not job['video_type']:
+        raise ValueError(f"Manifest job needs a video_type or coin{where}")
+    if 'rank' in job:
+        job['rank'] = int(job['rank'])
+    return job
+
+
+def manifest_batch_id(path):
+    """
+    Batch id for a manifest: its name, today's date and a hash of its content,
+    so rerunning the same manifest the same day resumes the same batch
+    """
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:8]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{datetime.now().strftime('%Y%m%d')}_{digest}"
+
+
+def _init_worker(encode_profile, encode_threads, journal_path=None):
+    """Process pool initializer: build the API client, renderers, TTS and composer once per worker"""
+    global _pipeline
+    from src.pipeline import VideoPipeline
+    # Each worker opens its own connection; SQLite connections don't survive a fork
+    journal = JobJournal(journal_path) if journal_path else None
+    # One encode at a time per worker: the pool size is the encode parallelism
+    _pipeline = VideoPipeline(encode_workers=1, encode_profile=encode_profile, encode_threads=encode_threads,
+                              journal=journal)
+
+
+def _run_chunk(run_id, jobs):
+    """Run a slice of the batch on this worker's pipeline, stages overlapping within the slice"""
+    results = _pipeline.run_sync(jobs, run_id)
+    for result in results:
+        result['worker'] = os.getpid()
+    return results
+
+
+class BatchRunner:
+    """
+    Run a manifest of jobs across a process pool.
+
+    Jobs are cut into chunks of `chunk_size`; each worker process keeps one
+    VideoPipeline (built once by the pool initializer) and runs a chunk at a
+    time through it, so fetch, chart, TTS and encode still overlap inside a
+    worker while the pool keeps every core busy. A JSON summary with each
+    job's status and stage timings is written when the batch finishes.
+
+    With the job journal enabled, rerunning a batch under the same id skips
+    jobs whose videos are done and resumes the others from their last
+    completed stage. With `gc` (BATCH_GC_ENABLED) the asset retention
+    policies are applied once the batch is over.
+    """
+
+    def __init__(self, workers=None, chunk_size=None, summary_dir=None, encode_profile=None, journal=None,
+                 gc=None):
+        self.workers = workers or int(os.getenv('BATCH_WORKERS') or os.cpu_count() or 1)
+        self.chunk_size = chunk_size or int(os.getenv('BATCH_CHUNK_SIZE', 4))
+        self.summary_dir = summary_dir or os.getenv('BATCH_SUMMARY_DIR', './assets/output/batches')
+        self.encode_profile = encode_profile or os.getenv('BATCH_ENCODE_PROFILE', 'throughput')
+        if journal is None and journal_enabled():
+            journal = JobJournal()
+        self.journal = journal
+        self.gc = gc_after_batch_enabled() if gc is None else gc
+
+    def run(self, jobs, batch_id=None, manifest=None):
+        """
+        Run every job, returning the summary dict (also written to summary_path)
+        """
+        if not batch_id:
+            batch_id = manifest_batch_id(manifest) if manifest else datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Outputs are named after their inputs, so workers never collide on file names
+        jobs = [dict(job) for job in jobs]
+        results = [None] * len(jobs)
+        pending = list(range(len(jobs)))
+        if self.journal:
+            keys = JobJournal.job_keys(jobs)
+            self.journal.register_jobs(batch_id, jobs, keys)
+            completed = self.journal.completed(batch_id)
+            mark_used(list(completed.values()))
+            for index, key in enumerate(keys):
+                jobs[index] = dict(jobs[index], batch_id=batch_id, job_key=key)
+                if key in completed:
+                    results[index] = {'job': jobs[index], 'success': True, 'video_path': completed[key],
+                                      'timings': {}, 'resumed': True}
+            pending = [index for index in pending if results[index] is None]
+            if len(pending) < len(jobs):
+                print(f"♻️ Batch {batch_id}: {len(jobs) - len(pending)} jobs already done, resuming the rest")
+
+        chunks = [pending[start:start + self.chunk_size] for start in range(0, len(pending), self.chunk_size)]
+        workers = max(1, min(self.workers, len(chunks) or 1))
+        _, threads = split_cores(workers)
+        started = time.time()
+
+        if chunks and background_prerender_enabled():
+            # Rendered once here rather than raced by every worker's first run
+            from src.template_manager import TemplateManager
+            from src.video_composer import VideoComposer
+            VideoComposer().backgrounds.prerender(TemplateManager().templates['backgrounds'], durations=(15,))
+
+        print(f"🏭 Batch {batch_id}: {len(pending)} jobs on {workers} workers "
+              f"({threads} encode threads each, {self.chunk_size} jobs per chunk)")
+        journal_path = self.journal.path if self.journal else None
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(self.encode_profile, threads, journal_path)) as pool:
+            futures = {pool.submit(_run_chunk, f"{batch_id}_{number:03d}", [jobs[index] for index in chunk]): chunk
+                       for number, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    chunk_results = future.result()
+                except Exception as e:
+                    # A crashed worker fails its own chunk, not the batch
+                    print(f"❌ Worker failed on jobs {chunk[0]}-{chunk[-1]}: {e}")
+                    chunk_results = [{'job': jobs[index], 'success': False, 'video_path': None,
+                                      'timings': {}, 'error': str(e)} for index in chunk]
+                for index, result in zip(chunk, chunk_results):
+                    results[index] = result
+                done = sum(result is not None for result in results)
+                print(f"📦 {done}/{len(jobs)} jobs finished")
+
+        summary = self.summarize(batch_id, results, started, time.time(), workers, manifest)
+        if self.gc:
+            # This batch's artifacts are journaled as recent, so they are kept
+            collected = AssetGC(journal=self.journal).collect()
+            summary['gc'] = {key: value for key, value in collected.items() if key != 'removed'}
+        self.write_summary(summary)
+        return summary
+
+    def summarize(self, batch_id, results, started, finished, workers, manifest=None):
+        wall = finished - started
+        succeeded = sum(1 for result in results if result['success'])
+        stage_totals = {}
+        for result in results:
+            for stage, seconds in result['timings'].items():
+                stage_totals[stage] = round(stage_totals.get(stage, 0) + seconds, 3)
+        return {
+            'batch_id': batch_id,
+            'manifest': manifest,
+            'workers': workers,
+            'chunk_size': self.chunk_size,
+            'encode_profile': self.encode_profile,
+            'started': datetime.fromtimestamp(started).isoformat(),
+            'finished': datetime.fromtimestamp(finished).isoformat(),
+            'wall_seconds': round(wall, 3),
+            'jobs_total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'videos_per_hour': round(succeeded * 3600 / wall, 1) if wall > 0 else None,
+            'stage_seconds_total': stage_totals,
+            'jobs': [
+                {
+                    'index': index,
+                    'name': result['job'].get('name'),
+                    'video_type': result['job'].get('video_type'),
+                    'coin_id': result['job'].get('coin_id'),
+                    'success': result['success'],
+                    'resumed': result.get('resumed', False),
+                    'video_path': result['video_path'],
+                    'outputs': result.get('outputs'),
+                    'error': result.get('error'),
+                    'worker': result.get('worker'),
+                    'timings': {stage: round(seconds, 3) for stage, seconds in result['timings'].items()},
+                }
+                for index, result in enumerate(results)
+            ],
+        }
+
+    def summary_path(self, batch_id):
+        return os.path.join(self.summary_dir, f"batch_{batch_id}_summary.json")
+
+    def write_summary(self, summary):
+        os.makedirs(self.summary_dir, exist_ok=True)
+        path = self.summary_path(summary['batch_id'])
+        fd, tmp_path = tempfile.mkstemp(dir=self.summary_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(tmp_path, path)
+        print(f"📝 Batch summary written to {path}")
+        return path
@@ -0,0 +1,115 @@
+import math
+import numpy as np
+from PIL import Image
+
+# Share of the clip spent drawing; the finished chart holds for the rest
+DRAW_FRACTION = 0.85
+HEAD_RADIUS = 7
+
+
+class DrawOnAnimation:
+    """
+    Progressive "draw-on" reveal of a rendered chart, produced as raw RGBA frames.
+
+    The chart is decoded once; each frame uncovers the next columns (ease-out
+    over DRAW_FRACTION of the clip) and puts a glowing head dot on the line at
+    the reveal edge. Frames are built in one reused buffer and yielded as
+    bytes, so memory stays at a couple of frames whatever the duration. Once
+    the chart is complete the stream simply ends: FFmpeg's overlay repeats
+    the last frame for the rest of the video.
+    """
+
+    def __init__(self, chart_path, width=800, height=400, duration=15, fps=30):
+        image = Image.open(chart_path).convert('RGBA')
+        if image.size != (width, height):
+            image = image.resize((width, height), Image.LANCZOS)
+        self.chart = np.asarray(image)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.draw_frames = max(1, int(math.ceil(duration * DRAW_FRACTION * fps)))
+        self.line_y = self._line_centers(self.chart)
+        self.head = self._head_sprite(self._line_color(self.chart))
+
+    @property
+    def frame_count(self):
+        # One extra frame so the final, complete chart is what gets repeated
+        return self.draw_frames + 1
+
+    @staticmethod
+    def _line_centers(chart):
+        """Row of the line in each column (alpha-weighted), NaN where the column is empty"""
+        alpha = chart[:, :, 3].astype(np.float32)
+        # The fill is faint (alpha ~0.1); only the opaque stroke counts as the line
+        alpha[alpha < 128] = 0
+        weight = alpha.sum(axis=0)
+        rows = np.arange(chart.shape[0], dtype=np.float32)[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (alpha * rows).sum(axis=0) / weight
+
+    @staticmethod
+    def _line_color(chart):
+        opaque = chart[chart[:, :, 3] > 200]
+        if len(opaque) == 0:
+            return np.array([255, 255, 255], dtype=np.float32)
+        return np.median(opaque[:, :3], axis=0).astype(np.float32)
+
+    @staticmethod
+    def _head_sprite(color):
+        """Straight-alpha RGBA dot: a solid core in the line color with a soft white-hot glow"""
+        size = HEAD_RADIUS * 4 + 1
+        center = size // 2
+        yy, xx = np.mgrid[:size, :size]
+        distance = np.hypot(xx - center, yy - center)
+        core = np.clip(HEAD_RADIUS - distance + 0.5, 0, 1)
+        glow = np.exp(-(distance / (HEAD_RADIUS * 1.4)) ** 2) * 0.6
+        alpha = np.maximum(core, glow)
+        # White center fading to the line color toward the edge
+        mix = np.clip(1 - distance / HEAD_RADIUS, 0, 1)[:, :, None] * 0.6
+        rgb = color * (1 - mix) + 255 * mix
+        return np.dstack([rgb, alpha * 255]).astype(np.float32)
+
+    def reveal_x(self, index):
+        """Columns uncovered at frame `index` (ease-out cubic)"""
+        progress = min(1.0, index / self.draw_frames)
+        return int(round((1 - (1 - progress) ** 3) * self.width))
+
+    def frames(self):
+        """
+        Yield each frame as raw RGBA bytes (width * height * 4)
+        """
+        base = np.zeros_like(self.chart)
+        frame = np.empty_like(self.chart)
+        revealed = 0
+        for index in range(self.frame_count):
+            x = self.reveal_x(index)
+            if x > revealed:
+                base[:, revealed:x] = self.chart[:, revealed:x]
+                revealed = x
+            np.copyto(frame, base)
+            if x < self.width:
+                self._draw_head(frame, x)
+            yield frame.tobytes()
+
+    def _draw_head(self, frame, x):
+        # Follow the line at the reveal edge; skip columns the line doesn't reach
+        column = min(max(x - 1, 0), self.width - 1)
+        y = self.line_y[column]
+        if math.isnan(y):
+            return
+        size = self.head.shape[0]
+        top, left = int(round(y)) - size // 2, column - size // 2
+        y0, x0 = max(top, 0), max(left, 0)
+        y1, x1 = min(top + size, self.height), min(left + size, self.width)
+        if y0 >= y1 or x0 >= x1:
+            return
+
+        sprite = self.head[y0 - top:y1 - top, x0 - left:x1 - left]
+        target = frame[y0:y1, x0:x1].astype(np.float32)
+        src_a = sprite[:, :, 3:] / 255
+        dst_a = target[:, :, 3:] / 255
+        out_a = src_a + dst_a * (1 - src_a)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out_rgb = (sprite[:, :, :3] * src_a + target[:, :, :3] * dst_a * (1 - src_a)) / out_a
+        frame[y0:y1, x0:x1, :3] = np.nan_to_num(out_rgb).clip(0, 255)
+        frame[y0:y1, x0:x1, 3:] = (out_a * 255).clip(0, 255)
@@ -1,106 +1,255 @@
+import hashlib
+import io
+import math
 import os
 import requests
-import json
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from PIL import Image
+
+from src.artifacts import content_key, mark_used, write_atomic
+from src.chart_renderer import get_renderer
+from src.chart_templates import ChartTemplate, Slot
+from src.downsample import chart_point_budget, downsample
+from src.http_client import shared_client
+from src.instrumentation import span
 
 load_dotenv()
 
+# Static Chart.js sparkline config, compiled once per process
+SPARKLINE_TEMPLATE = ChartTemplate({
+    "type": "line",
+    "data": {
+        "labels": Slot('labels'),
+        "datasets": [{
+            "data": Slot('data'),
+            "borderColor": Slot('line_color'),
+            "backgroundColor": Slot('fill_color'),
+            "borderWidth": 4,
+            "fill": True,
+            "tension": 0.4,
+            "pointRadius": 0,
+            "pointHoverRadius": 0
+        }]
+    },
+    "options": {
+        "responsive": True,
+        "maintainAspectRatio": False,
+        "plugins": {
+            "legend": {
+                "display": False
+            },
+            "tooltip": {
+                "enabled": False
+            }
+        },
+        "scales": {
+            "x": {
+                "display": False,
+                "grid": {
+                    "display": False
+                }
+            },
+            "y": {
+                "display": False,
+                "grid": {
+                    "display": False
+                }
+            }
+        },
+        "elements": {
+            "line": {
+                "borderCapStyle": 'round',
+                "borderJoinStyle": 'round'
+            }
+        }
+    }
+})
+
+
 class QuickChartGenerator:
-    def __init__(self):
+    def __init__(self, backend=None):
         self.base_url = os.getenv('QUICKCHART_BASE_URL', 'https://quickchart.io/chart')
-        self.session = requests.Session()
+        self.session = shared_client('quickchart')
+        # 'local' rasterizes in-process, 'quickchart' keeps the HTTP round-trip
+        self.renderer = get_renderer(backend, session=self.session)
         
-    def create_sparkline_chart(self, data, coin_name, price_change_24h, width=800, height=400):
+    def create_sparkline_chart(self, data, coin_name, price_change_24h, width=800, height=400,
+                               line_color=None, fill_color=None):
+        """
+        Create a sparkline chart for cryptocurrency data.
+        Colors default to green/red by the sign of the 24h change.
+        """
+        chart_config = self._sparkline_config(data, price_change_24h, width, line_color, fill_color)
+        if chart_config is None:
+            return None
+        return self._render(chart_config, coin_name, len(data), width, height)
+    
+    def save_sparkline_chart(self, data, coin_name, price_change_24h, filename, width=800, height=400,
+                             line_color=None, fill_color=None):
         """
-        Create a sparkline chart for cryptocurrency data
+        Render and save a sparkline under a name keyed on the backend, the
+        compiled config (series and colors) and the size. A chart already
+        saved from the same inputs is returned without rendering it again.
+        """
+        chart_config = self._sparkline_config(data, price_change_24h, width, line_color, fill_color)
+        if chart_config is None:
+            return None
+        key = content_key(self.renderer.name, chart_config.to_json(), width, height)
+        filepath = self.chart_path(filename, coin_name, key)
+        if os.path.exists(filepath):
+            mark_used(filepath)
+            print(f"♻️ Chart reused: {filepath}")
+            return filepath
+        
+        chart_data = self._render(chart_config, coin_name, len(data), width, height)
+        if not chart_data:
+            return None
+        return self.save_chart(chart_data, filename, coin_name, key=key)
+    
+    def _render(self, chart_config, coin_name, points, width, height):
+        try:
+            with span('chart.render', backend=self.renderer.name, coin=coin_name, points=points):
+                return self.renderer.render(chart_config, width, height)
+        except (requests.exceptions.RequestException, ValueError, OSError) as e:
+            print(f"Error generating chart: {e}")
+            return None
+    
+    def _sparkline_config(self, *args):
+        """sparkline_config, printing the error and returning None for a bad series"""
+        try:
+            return self.sparkline_config(*args)
+        except (TypeError, ValueError) as e:
+            print(f"Error generating chart: {e}")
+            return None
+    
+    def sparkline_config(self, data, price_change_24h=0, width=800, line_color=None, fill_color=None):
+        """
+        Build the compiled Chart.js config for a sparkline
         """
         # Determine color based on price change
         if price_change_24h >= 0:
-            line_color = '#00ff88'  # Green for positive
-            fill_color = 'rgba(0, 255, 136, 0.1)'
+            default_line = '#00ff88'  # Green for positive
+            default_fill = 'rgba(0, 255, 136, 0.1)'
         else:
-            line_color = '#ff4444'  # Red for negative
-            fill_color = 'rgba(255, 68, 68, 0.1)'
-        
-        chart_config = {
-            "type": "line",
-            "data": {
-                "labels": list(range(len(data))),
-                "datasets": [{
-                    "data": data,
-                    "borderColor": line_color,
-                    "backgroundColor": fill_color,
-                    "borderWidth": 4,
-                    "fill": True,
-                    "tension": 0.4,
-                    "pointRadius": 0,
-                    "pointHoverRadius": 0
-                }]
-            },
-            "options": {
-                "responsive": True,
-                "maintainAspectRatio": False,
-                "plugins": {
-                    "legend": {
-                        "display": False
-                    },
-                    "tooltip": {
-                        "enabled": False
-                    }
-                },
-                "scales": {
-                    "x": {
-                        "display": False,
-                        "grid": {
-                            "display": False
-                        }
-                    },
-                    "y": {
-                        "display": False,
-                        "grid": {
-                            "display": False
-                        }
-                    }
-                },
-                "elements": {
-                    "line": {
-                        "borderCapStyle": 'round',
-                        "borderJoinStyle": 'round'
-                    }
-                }
-            }
-        }
+            default_line = '#ff4444'  # Red for negative
+            default_fill = 'rgba(255, 68, 68, 0.1)'
+        line_color = line_color or default_line
+        fill_color = fill_color or default_fill
         
-        params = {
-            'c': json.dumps(chart_config),
-            'w': width,
-            'h': height,
-            'format': 'png',
-            'backgroundColor': 'transparent'
-        }
+        # Hourly/minutely histories have far more points than the chart has
+        # pixels; thin them to the pixel budget before encoding and drawing
+        budget = chart_point_budget(width)
+        if len(data) > budget:
+            data = downsample(data, budget).tolist()
         
-        try:
-            response = self.session.get(self.base_url, params=params)
-            response.raise_for_status()
-            return response.content
-        except requests.exceptions.RequestException as e:
-            print(f"Error generating chart: {e}")
-            return None
+        # Only the series and colors are encoded per call; the rest of the
+        # config was serialized once when the template was compiled
+        return SPARKLINE_TEMPLATE.fill(
+            labels=range(len(data)),
+            data=data,
+            line_color=line_color,
+            fill_color=fill_color
+        )
     
-    def save_chart(self, chart_data, filename, coin_name):
+    def render_many(self, series_list, styles=None, size=(800, 400), price_changes=None,
+                    layout='images', columns=None, workers=None):
         """
-        Save chart image to file
+        Render many sparklines in one call.
+        
+        `styles` holds one TemplateManager chart style ({'line': ..., 'fill': ...})
+        per series, reused round-robin if shorter; without styles the colors
+        follow the sign of `price_changes`. Charts render concurrently on a
+        thread pool, which hides QuickChart round-trips and lets NumPy/Pillow
+        work overlap locally.
+        
+        layout='images' returns one PNG (bytes, or None on failure) per series,
+        each `size` CSS px. layout='grid' returns (png_bytes, boxes): a single
+        sprite sheet of `size` px overall, split into `columns` columns, with
+        the (x, y, width, height) device-pixel box of each chart, so a
+        multi-coin sheet costs about as many pixels as one chart.
         """
+        count = len(series_list)
+        if count == 0:
+            return [] if layout == 'images' else (None, [])
+        styles = styles or [None]
+        price_changes = price_changes or [0] * count
+        if len(price_changes) != count:
+            raise ValueError(f"Got {len(price_changes)} price changes for {count} series")
+        width, height = size
+        
+        if layout == 'grid':
+            columns = columns or math.ceil(math.sqrt(count))
+            rows = math.ceil(count / columns)
+            cell_size = (width // columns, height // rows)
+        elif layout == 'images':
+            cell_size = size
+        else:
+            raise ValueError(f"Unknown layout: {layout}")
+        
+        def render_one(index):
+            style = styles[index % len(styles)] or {}
+            try:
+                config = self.sparkline_config(series_list[index], price_changes[index], cell_size[0],
+                                               style.get('line'), style.get('fill'))
+                with span('chart.render', backend=self.renderer.name, index=index,
+                          points=len(series_list[index])):
+                    if layout == 'images':
+                        return self.renderer.render(config, *cell_size)
+                    return self.renderer.render_image(config, *cell_size)
+            except (requests.exceptions.RequestException, TypeError, ValueError, OSError) as e:
+                print(f"Error generating chart {index}: {e}")
+                return None
+        
+        workers = workers or int(os.getenv('CHART_RENDER_WORKERS', min(8, count)))
+        with span('chart.render_many', count=count, layout=layout), \
+                ThreadPoolExecutor(max(1, min(workers, count))) as pool:
+            rendered = list(pool.map(render_one, range(count)))
+        
+        if layout == 'images':
+            return rendered
+        return self._sprite_sheet(rendered, columns)
+    
+    @staticmethod
+    def _sprite_sheet(images, columns):
+        """Paste rendered charts into one transparent sheet, row by row"""
+        drawn = [image for image in images if image is not None]
+        if not drawn:
+            return None, []
+        cell_width = max(image.width for image in drawn)
+        cell_height = max(image.height for image in drawn)
+        rows = math.ceil(len(images) / columns)
+        sheet = Image.new('RGBA', (cell_width * columns, cell_height * rows), (0, 0, 0, 0))
+        
+        boxes = []
+        for index, image in enumerate(images):
+            x, y = (index % columns) * cell_width, (index // columns) * cell_height
+            boxes.append((x, y, cell_width, cell_height))
+            if image is not None:
+                sheet.paste(image, (x, y))
+        
+        buffer = io.BytesIO()
+        sheet.save(buffer, format='PNG', compress_level=1)
+        return buffer.getvalue(), boxes
+    
+    def chart_path(self, filename, coin_name, key):
         charts_dir = os.getenv('CHARTS_DIR', './assets/charts')
         os.makedirs(charts_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filepath = os.path.join(charts_dir, f"{coin_name}_{timestamp}_{filename}.png")
+        return os.path.join(charts_dir, f"{coin_name}_{filename}_{key}.png")
+    
+    def save_chart(self, chart_data, filename, coin_name, key=None):
+        """
+        Save chart image to file, named by `key` or else by a hash of the image
+        itself; identical charts share one file
+        """
+        filepath = self.chart_path(filename, coin_name, key or hashlib.sha256(chart_data).hexdigest()[:16])
+        if os.path.exists(filepath):
+            mark_used(filepath)
+            print(f"♻️ Chart reused: {filepath}")
+            return filepath
         
         try:
-            with open(filepath, 'wb') as f:
-                f.write(chart_data)
+            write_atomic(filepath, chart_data)
             print(f"Chart saved: {filepath}")
             return filepath
         except Exception as e:
@@ -0,0 +1,273 @@
+import io
+import os
+import re
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+from dotenv import load_dotenv
+
+from src.chart_templates import chart_dict, chart_json
+from src.http_client import shared_client
+from src.instrumentation import record_response, span
+
+load_dotenv()
+
+# QuickChart renders at devicePixelRatio 2, so an 800x400 request yields a 1600x800 PNG
+DEFAULT_PIXEL_RATIO = 2
+
+_RGBA_PATTERN = re.compile(r'rgba?\(\s*([^)]*)\)', re.IGNORECASE)
+
+
+def parse_color(value):
+    """
+    Parse a Chart.js color string (#hex, rgb(), rgba() or a CSS name) into an RGBA tuple
+    """
+    value = value.strip()
+    match = _RGBA_PATTERN.fullmatch(value)
+    if match:
+        parts = [p.strip() for p in match.group(1).split(',')]
+        r, g, b = (int(float(p)) for p in parts[:3])
+        alpha = float(parts[3]) if len(parts) > 3 else 1.0
+        return (r, g, b, int(round(alpha * 255)))
+    color = ImageColor.getrgb(value)
+    return color if len(color) == 4 else color + (255,)
+
+
+class QuickChartRenderer:
+    """
+    Render Chart.js configs through the QuickChart HTTP API.
+
+    Small configs go as a GET query string (cacheable by QuickChart's CDN);
+    anything over QUICKCHART_GET_MAX_BYTES is POSTed as a JSON body, which
+    has no URL length limit and skips percent-encoding the whole series.
+    """
+
+    name = 'quickchart'
+
+    def __init__(self, base_url=None, session=None, get_max_bytes=None):
+        self.base_url = base_url or os.getenv('QUICKCHART_BASE_URL', 'https://quickchart.io/chart')
+        self.session = session or shared_client('quickchart')
+        self.get_max_bytes = get_max_bytes or int(os.getenv('QUICKCHART_GET_MAX_BYTES', 4096))
+
+    def render(self, chart_config, width, height):
+        """
+        Render a chart config (dict or CompiledChart) to PNG bytes with a round-trip to QuickChart
+        """
+        config_json = chart_json(chart_config)
+        use_post = len(config_json) > self.get_max_bytes
+        with span('http.quickchart', width=width, height=height, method='POST' if use_post else 'GET') as s:
+            if use_post:
+                # The chart JSON is spliced in as-is instead of being parsed and re-dumped
+                body = (f'{{"width":{int(width)},"height":{int(height)},"format":"png",'
+                        f'"backgroundColor":"transparent","chart":{config_json}}}')
+                response = self.session.post(self.base_url, data=body.encode('utf-8'),
+                                             headers={'Content-Type': 'application/json'})
+            else:
+                params = {
+                    'c': config_json,
+                    'w': width,
+                    'h': height,
+                    'format': 'png',
+                    'backgroundColor': 'transparent'
+                }
+                response = self.session.get(self.base_url, params=params)
+                # GET carries the config in the query string rather than a body
+                s.bytes_out += len(config_json)
+            record_response(s, response)
+            response.raise_for_status()
+            return response.content
+
+    def render_image(self, chart_config, width, height):
+        """
+        Render a chart config to an RGBA Pillow image (QuickChart returns device pixels)
+        """
+        image = Image.open(io.BytesIO(self.render(chart_config, width, height)))
+        return image.convert('RGBA')
+
+
+class LocalSparklineRenderer:
+    """
+    Rasterize line/sparkline Chart.js configs in-process with NumPy and Pillow.
+
+    Mirrors what Chart.js does for the configs QuickChartGenerator builds: hidden
+    axes, a linear y scale rounded out to "nice" tick bounds, bezier smoothing
+    from the dataset tension, fill to the bottom of the chart area and round
+    caps/joins, drawn on a transparent canvas at QuickChart's pixel ratio.
+    """
+
+    name = 'local'
+
+    def __init__(self, pixel_ratio=DEFAULT_PIXEL_RATIO, supersample=2):
+        self.pixel_ratio = pixel_ratio
+        self.supersample = supersample
+
+    def render(self, chart_config, width, height):
+        """
+        Render a chart config to PNG bytes
+        """
+        with span('render.local', width=width, height=height) as s:
+            buffer = io.BytesIO()
+            # Fast zlib level: these PNGs are intermediates that ffmpeg decodes right away
+            self.render_image(chart_config, width, height).save(buffer, format='PNG', compress_level=1)
+            s.bytes_in = buffer.tell()
+            return buffer.getvalue()
+
+    def render_array(self, chart_config, width, height):
+        """
+        Render a chart config to an RGBA uint8 array of shape (height, width, 4) in device pixels
+        """
+        return np.asarray(self.render_image(chart_config, width, height))
+
+    def render_image(self, chart_config, width, height):
+        """
+        Render a chart config to a transparent RGBA Pillow image in device pixels
+        """
+        chart_config = chart_dict(chart_config)
+        out_size = (int(width * self.pixel_ratio), int(height * self.pixel_ratio))
+        image = Image.new('RGBA', out_size, (0, 0, 0, 0))
+
+        # Each layer is a coverage mask painted in a single color
+        for dataset in chart_config.get('data', {}).get('datasets', []):
+            for color, mask in self._dataset_layers(dataset, chart_config, width, height, out_size):
+                layer = Image.new('RGBA', out_size, color[:3] + (0,))
+                alpha = color[3]
+                layer.putalpha(mask.point(lambda v: v * alpha // 255) if alpha < 255 else mask)
+                image = Image.alpha_composite(image, layer)
+        return image
+
+    def _dataset_layers(self, dataset, chart_config, width, height, out_size):
+        """
+        Yield (rgba, coverage mask) pairs for a dataset: the fill first, then the line
+        """
+        values = np.asarray(dataset.get('data', []), dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+
+        border_width = float(dataset.get('borderWidth', 3))
+        tension = float(dataset.get('tension', 0))
+        line_options = chart_config.get('options', {}).get('elements', {}).get('line', {})
+        cap_style = dataset.get('borderCapStyle', line_options.get('borderCapStyle', 'butt'))
+
+        # Chart.js pads the chart area by half the border width so the stroke is not clipped
+        pad = border_width / 2
+        left, top = pad, pad
+        right, bottom = width - pad, height - pad
+
+        y_min, y_max = nice_bounds(values.min(), values.max())
+        xs = left + np.arange(values.size) * ((right - left) / max(values.size - 1, 1))
+        ys = bottom - (values - y_min) / (y_max - y_min) * (bottom - top)
+
+        curve = smooth_curve(xs, ys, tension, (left, top, right, bottom), samples=self._curve_samples(values.size, width))
+        # Masks are drawn supersampled and box-filtered down for anti-aliasing
+        scale = self.pixel_ratio * self.supersample
+        canvas_size = (out_size[0] * self.supersample, out_size[1] * self.supersample)
+        points = [tuple(p) for p in curve * scale]
+
+        if dataset.get('fill', False) and dataset.get('backgroundColor'):
+            mask = Image.new('L', canvas_size, 0)
+            base = bottom * scale
+            polygon = [(points[0][0], base)] + points + [(points[-1][0], base)]
+            ImageDraw.Draw(mask).polygon(polygon, fill=255)
+            yield parse_color(dataset['backgroundColor']), self._downsample(mask, out_size)
+
+        mask = Image.new('L', canvas_size, 0)
+        draw = ImageDraw.Draw(mask)
+        stroke_width = max(1, int(round(border_width * scale)))
+        if len(points) > 1:
+            draw.line(points, fill=255, width=stroke_width, joint='curve')
+        if cap_style == 'round' or len(points) == 1:
+            radius = stroke_width / 2
+            for x, y in (points[0], points[-1]):
+                draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=255)
+        yield parse_color(dataset.get('borderColor', 'rgba(0, 0, 0, 0.1)')), self._downsample(mask, out_size)
+
+    def _downsample(self, mask, out_size):
+        if self.supersample > 1:
+            return mask.reduce(self.supersample)
+        return mask
+
+    @staticmethod
+    def _curve_samples(count, width):
+        # Roughly one bezier sample every 3 CSS px, without oversampling dense series
+        if count < 2:
+            return 1
+        return int(np.clip(np.ceil(width / (count - 1) / 3), 2, 64))
+
+
+def nice_num(value):
+    """Round a range up to 1, 2, 5 or 10 times a power of ten (Chart.js niceNum)"""
+    exponent = np.floor(np.log10(value))
+    fraction = value / 10 ** exponent
+    if fraction <= 1:
+        nice = 1
+    elif fraction <= 2:
+        nice = 2
+    elif fraction <= 5:
+        nice = 5
+    else:
+        nice = 10
+    return nice * 10 ** exponent
+
+
+def nice_bounds(data_min, data_max, max_ticks=11):
+    """
+    Expand a data range to the tick-aligned bounds Chart.js uses for a linear scale
+    """
+    if data_max == data_min:
+        offset = abs(data_min) * 0.05 or 1
+        data_min, data_max = data_min - offset, data_max + offset
+    spacing = nice_num((data_max - data_min) / (max_ticks - 1))
+    nice_min = np.floor(data_min / spacing) * spacing
+    nice_max = np.ceil(data_max / spacing) * spacing
+    if (nice_max - nice_min) / spacing > max_ticks - 1:
+        spacing = nice_num((nice_max - nice_min) / (max_ticks - 1))
+        nice_min = np.floor(data_min / spacing) * spacing
+        nice_max = np.ceil(data_max / spacing) * spacing
+    return float(nice_min), float(nice_max)
+
+
+def smooth_curve(xs, ys, tension, area, samples=8):
+    """
+    Sample the Chart.js tension spline through (xs, ys) as an (N, 2) array of points
+    """
+    points = np.column_stack([xs, ys])
+    if tension <= 0 or len(points) < 3:
+        return points
+
+    prev_pts = np.vstack([points[:1], points[:-1]])
+    next_pts = np.vstack([points[1:], points[-1:]])
+    d01 = np.hypot(*(points - prev_pts).T)
+    d12 = np.hypot(*(next_pts - points).T)
+    total = d01 + d12
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s01 = np.where(total > 0, d01 / total, 0)
+        s12 = np.where(total > 0, d12 / total, 0)
+    delta = next_pts - prev_pts
+    cp_prev = points - (tension * s01)[:, None] * delta
+    cp_next = points + (tension * s12)[:, None] * delta
+
+    # capBezierPoints: keep control points inside the chart area
+    left, top, right, bottom = area
+    lo, hi = np.array([left, top]), np.array([right, bottom])
+    cp_prev = np.clip(cp_prev, lo, hi)
+    cp_next = np.clip(cp_next, lo, hi)
+
+    p0, p1 = points[:-1], points[1:]
+    c1, c2 = cp_next[:-1], cp_prev[1:]
+    t = np.linspace(0, 1, samples, endpoint=False)[None, :, None]
+    u = 1 - t
+    segments = (u ** 3 * p0[:, None] + 3 * u ** 2 * t * c1[:, None]
+                + 3 * u * t ** 2 * c2[:, None] + t ** 3 * p1[:, None])
+    return np.vstack([segments.reshape(-1, 2), points[-1:]])
+
+
+def get_renderer(name=None, session=None):
+    """
+    Build a chart renderer by name ('local' or 'quickchart'), defaulting to CHART_BACKEND
+    """
+    name = name or os.getenv('CHART_BACKEND', 'local')
+    if name == QuickChartRenderer.name:
+        return QuickChartRenderer(session=session)
+    if name == LocalSparklineRenderer.name:
+        return LocalSparklineRenderer()
+    raise ValueError(f"Unknown chart backend: {name} (available: local, quickchart)")
@@ -0,0 +1,114 @@
+import json
+import re
+from functools import lru_cache
+
+import numpy as np
+
+_SLOT_PREFIX = '\x00slot:'
+# How a slot marker string looks once json.dumps has escaped it
+_SLOT_PATTERN = re.compile(r'"\\u0000slot:(\w+)"')
+
+
+class Slot:
+    """Placeholder for a per-call value in a ChartTemplate config"""
+
+    def __init__(self, name):
+        self.name = name
+
+
+class ChartTemplate:
+    """
+    Chart.js config with Slot placeholders, serialized once.
+
+    The static part of the config is dumped to JSON a single time and split
+    around the slots; fill() only has to encode the per-call values (series,
+    labels, colors) and join them with the precomputed chunks.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        text = json.dumps(self._mark(config), separators=(',', ':'))
+        parts = _SLOT_PATTERN.split(text)
+        # parts alternates static JSON and slot names: [json, name, json, name, ..., json]
+        self._chunks = parts[0::2]
+        self._slot_order = parts[1::2]
+
+    def _mark(self, node):
+        if isinstance(node, Slot):
+            return f"{_SLOT_PREFIX}{node.name}"
+        if isinstance(node, dict):
+            return {key: self._mark(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [self._mark(value) for value in node]
+        return node
+
+    def fill(self, **values):
+        missing = set(self._slot_order) - set(values)
+        if missing:
+            raise ValueError(f"Missing chart template values: {', '.join(sorted(missing))}")
+        return CompiledChart(self, values)
+
+
+class CompiledChart:
+    """A ChartTemplate with its slot values; serializes without re-walking the static config"""
+
+    def __init__(self, template, values):
+        self.template = template
+        self.values = values
+        self._json = None
+
+    def to_json(self):
+        if self._json is None:
+            template = self.template
+            parts = [template._chunks[0]]
+            for name, chunk in zip(template._slot_order, template._chunks[1:]):
+                parts.append(encode_value(self.values[name]))
+                parts.append(chunk)
+            self._json = ''.join(parts)
+        return self._json
+
+    def to_dict(self):
+        """The equivalent plain config dict, for renderers that walk the structure"""
+        return self._materialize(self.template.config)
+
+    def _materialize(self, node):
+        if isinstance(node, Slot):
+            value = self.values[node.name]
+            if isinstance(value, range):
+                return list(value)
+            return value.tolist() if isinstance(value, np.ndarray) else value
+        if isinstance(node, dict):
+            return {key: self._materialize(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [self._materialize(value) for value in node]
+        return node
+
+
+def encode_value(value):
+    """JSON-encode a slot value; ranges (Chart.js labels) are cached by length"""
+    if isinstance(value, range) and value.start == 0 and value.step == 1:
+        return _range_json(value.stop)
+    if isinstance(value, range):
+        value = list(value)
+    elif isinstance(value, np.ndarray):
+        value = value.tolist()
+    return json.dumps(value, separators=(',', ':'))
+
+
+@lru_cache(maxsize=64)
+def _range_json(length):
+    return '[' + ','.join(map(str, range(length))) + ']'
+
+
+def chart_json(chart_config):
+    """Serialize a config dict or CompiledChart to compact JSON"""
+    if isinstance(chart_config, CompiledChart):
+        return chart_config.to_json()
+    return json.dumps(chart_config, separators=(',', ':'))
+
+
+def chart_dict(chart_config):
+    """Get a plain config dict from a config dict or CompiledChart"""
+    if isinstance(chart_config, CompiledChart):
+        return chart_config.to_dict()
+    return chart_config
@@ -1,22 +1,73 @@
 import os
+import threading
 import requests
-import json
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from src.api_cache import ResponseCache, cache_enabled
+from src.http_client import shared_client
+from src.instrumentation import record_response, span
+from src.market_snapshot import MarketSnapshot
+from src.price_history import align_histories
+
 load_dotenv()
 
 class CoingeckoAPI:
-    def __init__(self):
+    def __init__(self, cache=None):
         self.base_url = os.getenv('COINGECKO_BASE_URL', 'https://api.coingecko.com/api/v3')
-        self.session = requests.Session()
+        self.session = shared_client('coingecko')
+        # cache: a ResponseCache, None for the default one (when API_CACHE_ENABLED),
+        # or False to always hit the API, e.g. in benchmarks
+        if cache is None and cache_enabled():
+            cache = ResponseCache()
+        self.cache = None if cache is False else cache
+        self._snapshots = {}
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+    
+    def _get(self, path, params, cache_endpoint):
+        """
+        GET a JSON endpoint, going through the response cache when enabled
+        (and cache_endpoint is set). Concurrent calls for the same URL and
+        params share one request.
+        """
+        url = f"{self.base_url}{path}"
+        
+        def load():
+            with span('http.coingecko', endpoint=cache_endpoint) as s:
+                response = self.session.get(url, params=params)
+                record_response(s, response)
+                response.raise_for_status()
+                return response.json()
+        
+        def fetch():
+            if self.cache is None or cache_endpoint is None:
+                return load()
+            return self.cache.fetch(cache_endpoint, {'url': url, **params}, load)
+        
+        key = (url, tuple(sorted((k, str(v)) for k, v in params.items())))
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+        
+        try:
+            future.set_result(fetch())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return future.result()
         
     def get_coin_markets(self, vs_currency='usd', order='market_cap_desc', 
                          per_page=10, page=1, sparkline=True):
         """
         Get top cryptocurrencies by market cap with sparkline data
         """
-        endpoint = f"{self.base_url}/coins/markets"
         params = {
             'vs_currency': vs_currency,
             'order': order,
@@ -27,20 +78,38 @@ class CoingeckoAPI:
         }
         
         try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get('/coins/markets', params, 'coins/markets')
         except requests.exceptions.RequestException as e:
             print(f"Error fetching coin markets: {e}")
             return None
     
+    def get_coin_market(self, coin_id, vs_currency='usd'):
+        """
+        Get the markets entry (price, 24h change, sparkline) for a single coin
+        """
+        snapshot = self.get_market_snapshot(vs_currency=vs_currency)
+        if snapshot and coin_id in snapshot:
+            return snapshot.coin(coin_id)
+        
+        params = {
+            'vs_currency': vs_currency,
+            'ids': coin_id,
+            'sparkline': True,
+            'price_change_percentage': '24h'
+        }
+        try:
+            markets = self._get('/coins/markets', params, 'coins/markets')
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching market data for {coin_id}: {e}")
+            return None
+        return next((coin for coin in markets or [] if coin['id'] == coin_id), None)
+    
     def get_simple_price(self, coin_ids, vs_currencies='usd', include_market_cap='false',
                         include_24hr_vol='false', include_24hr_change='false', 
                         include_last_updated_at='false'):
         """
         Get current price for specific coins
         """
-        endpoint = f"{self.base_url}/simple/price"
         params = {
             'ids': ','.join(coin_ids) if isinstance(coin_ids, list) else coin_ids,
             'vs_currencies': vs_currencies,
@@ -51,46 +120,59 @@ class CoingeckoAPI:
         }
         
         try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get('/simple/price', params, 'simple/price')
         except requests.exceptions.RequestException as e:
             print(f"Error fetching simple price: {e}")
             return None
     
+    def get_market_snapshot(self, size=None, vs_currency='usd', refresh=False):
+        """
+        Get a columnar snapshot of the top coins, fetched once per instance
+        """
+        size = size or int(os.getenv('MARKET_SNAPSHOT_SIZE', 50))
+        key = (size, vs_currency)
+        if refresh or key not in self._snapshots:
+            snapshot = MarketSnapshot.fetch(self, size=size, vs_currency=vs_currency)
+            if snapshot is None:
+                return None
+            self._snapshots[key] = snapshot
+        return self._snapshots[key]
+    
     def get_top_gainers(self, limit=5):
         """
         Get top gainers in the last 24 hours
         """
-        markets = self.get_coin_markets(per_page=50, sparkline=True)
-        if not markets:
+        snapshot = self.get_market_snapshot()
+        if not snapshot:
             return None
-            
-        # Filter by positive price change and sort
-        gainers = [coin for coin in markets if coin.get('price_change_percentage_24h', 0) > 0]
-        gainers.sort(key=lambda x: x.get('price_change_percentage_24h', 0), reverse=True)
         
-        return gainers[:limit]
+        return snapshot.top_gainers(limit)
     
     def get_top_losers(self, limit=5):
         """
         Get top losers in the last 24 hours
         """
-        markets = self.get_coin_markets(per_page=50, sparkline=True)
-        if not markets:
+        snapshot = self.get_market_snapshot()
+        if not snapshot:
             return None
-            
-        # Filter by negative price change and sort
-        losers = [coin for coin in markets if coin.get('price_change_percentage_24h', 0) < 0]
-        losers.sort(key=lambda x: x.get('price_change_percentage_24h', 0))
         
-        return losers[:limit]
+        return snapshot.top_losers(limit)
     
     def get_coin_price_history(self, coin_id, vs_currency='usd', days=7):
         """
         Get historical price data for a specific coin
         """
-        endpoint = f"{self.base_url}/coins/{coin_id}/market_chart"
+        points = self.get_coin_price_points(coin_id, vs_currency=vs_currency, days=days)
+        if points is None:
+            return None
+        
+        # Extract just the prices
+        return [price[1] for price in points]
+    
+    def get_coin_price_points(self, coin_id, vs_currency='usd', days=7):
+        """
+        Get daily [timestamp_ms, price] pairs for a specific coin
+        """
         params = {
             'vs_currency': vs_currency,
             'days': days,
@@ -98,13 +180,44 @@ class CoingeckoAPI:
         }
         
         try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract just the prices
-            prices = [price[1] for price in data['prices']]
-            return prices
+            data = self._get(f"/coins/{coin_id}/market_chart", params, 'coins/market_chart')
+            return data['prices']
         except requests.exceptions.RequestException as e:
             print(f"Error fetching price history: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    def get_coin_price_range(self, coin_id, from_timestamp, to_timestamp, vs_currency='usd'):
+        """
+        Get [timestamp_ms, price] pairs between two epoch-second timestamps
+        """
+        params = {
+            'vs_currency': vs_currency,
+            'from': int(from_timestamp),
+            'to': int(to_timestamp)
+        }
+        
+        try:
+            # Ranges end at "now" and never repeat, so they bypass the response cache
+            data = self._get(f"/coins/{coin_id}/market_chart/range", params, None)
+            return data['prices']
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching price range: {e}")
+            return None
+    
+    def get_price_histories(self, coin_ids, days=7, vs_currency='usd', concurrency=None, points=None):
+        """
+        Fetch price histories for many coins concurrently and align them on one time grid.
+        
+        Requests fan out over a thread pool and are paced by the shared
+        CoinGecko rate limiter; duplicate ids cost a single request. Returns
+        (timestamps_ms, prices) where prices is a (len(coin_ids), points)
+        matrix with NaN rows for coins that could not be fetched.
+        """
+        concurrency = concurrency or int(os.getenv('HISTORY_FETCH_CONCURRENCY', 8))
+        unique_ids = list(dict.fromkeys(coin_ids))
+        with ThreadPoolExecutor(max(1, min(concurrency, len(unique_ids) or 1))) as pool:
+            fetched = dict(zip(unique_ids, pool.map(
+                lambda coin_id: self.get_coin_price_points(coin_id, vs_currency=vs_currency, days=days),
+                unique_ids
+            )))
+        return align_histories([fetched[coin_id] for coin_id in coin_ids], points=points)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+
+# Min-max preselection keeps this many candidates per output point before LTTB
+PRESELECT_RATIO = 4
+
+
+def _bucket_edges(start, stop, buckets):
+    return np.linspace(start, stop, buckets + 1).astype(np.int64)
+
+
+def minmax_indices(y, n_out):
+    """
+    Indices of the min and max of each of n_out // 2 equal buckets, in order.
+
+    Fully vectorized: the series is padded to a whole number of buckets,
+    reshaped to one row per bucket and reduced with argmin/argmax.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    buckets = max(1, n_out // 2)
+    width = -(-n // buckets)
+    if np.isnan(y).any():
+        # Gaps must never win the argmin/argmax
+        y = np.where(np.isnan(y), np.nanmean(y), y)
+    # Pad with the last value so the series splits into whole rows
+    padded = np.empty(buckets * width)
+    padded[:n] = y
+    padded[n:] = y[-1]
+    rows = padded.reshape(buckets, width)
+
+    offsets = np.arange(buckets) * width
+    pairs = np.sort(np.stack([rows.argmin(axis=1), rows.argmax(axis=1)], axis=1), axis=1) + offsets[:, None]
+    indices = np.minimum(pairs.ravel(), n - 1)
+    # Flat buckets pick the same point twice
+    return indices[np.append(True, indices[1:] != indices[:-1])]
+
+
+def lttb_indices(y, n_out, x=None):
+    """
+    Indices picked by Largest-Triangle-Three-Buckets.
+
+    First and last points are kept and every bucket in between contributes
+    the point forming the largest triangle with the previously selected point
+    and the next bucket's centroid. Bucket centroids come from cumulative sums
+    and each bucket's triangle areas are one vectorized expression, so the
+    Python loop runs once per output point rather than once per input point.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    edges = _bucket_edges(1, n - 1, n_out - 2)
+    starts, stops = edges[:-1], edges[1:]
+
+    # Centroid of every bucket, plus the final point as the "next bucket" of the last one
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    counts = stops - starts
+    centroid_x = np.append((cum_x[stops] - cum_x[starts]) / counts, x[-1])
+    centroid_y = np.append((cum_y[stops] - cum_y[starts]) / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = starts[i], stops[i]
+        ax, ay = x[a], y[a]
+        cx, cy = centroid_x[i + 1], centroid_y[i + 1]
+        areas = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(y, n_out, x=None, method='lttb'):
+    """
+    Reduce a series to at most n_out points while keeping its visual shape.
+
+    `method` is 'lttb' (default), 'minmax' (keeps every local extreme, good
+    for spiky data) or 'minmax-lttb' (min-max preselection to
+    PRESELECT_RATIO * n_out candidates, then LTTB on those). Returns the kept
+    values (and x values when `x` is given) as NumPy arrays.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    xs = None if x is None else np.asarray(x, dtype=np.float64)
+    if len(y) <= n_out:
+        return y if xs is None else (xs, y)
+
+    if method == 'minmax':
+        indices = minmax_indices(y, n_out)
+    elif method == 'lttb':
+        indices = lttb_indices(y, n_out, xs)
+    elif method == 'minmax-lttb':
+        candidates = minmax_indices(y, n_out * PRESELECT_RATIO)
+        # Keep the endpoints so LTTB anchors on the true first and last points
+        candidates = np.union1d(candidates, [0, len(y) - 1])
+        cand_x = candidates.astype(np.float64) if xs is None else xs[candidates]
+        indices = candidates[lttb_indices(y[candidates], n_out, cand_x)]
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    return y[indices] if xs is None else (xs[indices], y[indices])
+
+
+def chart_point_budget(width):
+    """
+    Points worth drawing across a chart `width` CSS pixels wide (CHART_MAX_POINTS overrides)
+    """
+    # An empty value (as copied from .env.example) means unset
+    return int(os.getenv('CHART_MAX_POINTS') or 0) or int(width)
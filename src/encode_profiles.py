@@ -0,0 +1,83 @@
+import os
+
+# Named libx264 settings for VideoComposer. Our videos are a mostly static
+# chart over a flat or slowly moving background, so long GOPs cost little
+# quality; threads=0 lets x264 pick. 'tune' applies to static content (a
+# faded-in chart over a solid color): content that moves (drawn-on charts,
+# gradient or cellauto backgrounds) is encoded with content_tune()'s
+# 'animation' instead, since stillimage blurs motion.
+ENCODE_PROFILES = {
+    # Fast previews: lowest CPU, visibly softer
+    'draft': {
+        'preset': 'ultrafast',
+        'tune': 'stillimage',
+        'crf': 30,
+        'gop': 150,
+        'threads': 0,
+        'x264_params': 'rc-lookahead=0:ref=1',
+    },
+    # Upload quality; matches the previous hardcoded preset/crf
+    'publish': {
+        'preset': 'fast',
+        'tune': 'stillimage',
+        'crf': 23,
+        'gop': 60,
+        'threads': 0,
+        'x264_params': 'rc-lookahead=20',
+    },
+    # Batch runs: several encodes side by side, each on a slice of the cores
+    'throughput': {
+        'preset': 'veryfast',
+        'tune': 'stillimage',
+        'crf': 24,
+        'gop': 120,
+        'threads': 2,
+        'x264_params': 'rc-lookahead=10:ref=2',
+    },
+}
+
+
+def get_encode_profile(name=None):
+    """
+    Look up an encode profile by name, defaulting to ENCODE_PROFILE (publish)
+    """
+    name = name or os.getenv('ENCODE_PROFILE', 'publish')
+    if name not in ENCODE_PROFILES:
+        raise ValueError(f"Unknown encode profile: {name} (available: {', '.join(ENCODE_PROFILES)})")
+    return ENCODE_PROFILES[name]
+
+
+def content_tune(name=None, animated=False):
+    """
+    x264 tune for a profile given the content: 'animation' for moving content, else the profile's tune
+    """
+    return 'animation' if animated else get_encode_profile(name)['tune']
+
+
+def encode_args(name=None, threads=None, tune=None):
+    """
+    FFmpeg video encoder arguments for a profile; `threads` and `tune` override the profile's
+    """
+    profile = get_encode_profile(name)
+    threads = profile['threads'] if threads is None else threads
+    return [
+        '-c:v', 'libx264',
+        '-preset', profile['preset'],
+        '-tune', tune or profile['tune'],
+        '-crf', str(profile['crf']),
+        '-g', str(profile['gop']),
+        '-threads', str(threads),
+        '-x264-params', profile['x264_params'],
+        # Lavfi/RGBA graphs would otherwise default to yuv444p, which most players reject
+        '-pix_fmt', 'yuv420p',
+    ]
+
+
+def split_cores(parallel=None, cores=None):
+    """
+    Split the machine's cores across concurrent encodes, returning (parallel, threads_per_job)
+    """
+    cores = cores or os.cpu_count() or 1
+    parallel = parallel or int(os.getenv('ENCODE_PARALLEL', max(1, cores // 2)))
+    parallel = max(1, min(parallel, cores))
+    return parallel, max(1, cores // parallel)
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+load_dotenv()
+
+# One record per stored point: epoch milliseconds and price
+RECORD_DTYPE = np.dtype([('t', '<i8'), ('p', '<f8')])
+
+# resolution -> (step seconds, days kept on first backfill). /market_chart/range
+# answers ranges of 2-90 days hourly and longer ones daily.
+RESOLUTIONS = {
+    'hourly': (3600, 90),
+    'daily': (86400, 365),
+}
+
+
+class HistoryStore:
+    """
+    Append-only local price history, one memory-mapped record file per
+    (currency, resolution, coin).
+
+    The first request for a coin backfills its window with a single
+    /market_chart/range call; after that only the points newer than the last
+    stored timestamp are fetched and appended. 1d/7d/30d windows are sliced
+    from the hourly file and longer ones from the daily file, without
+    touching the API when the newest point is less than one step old.
+    """
+
+    def __init__(self, coingecko, root=None):
+        self.coingecko = coingecko
+        self.root = root or os.getenv('HISTORY_STORE_DIR', './assets/cache/history')
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def path_for(self, coin_id, vs_currency='usd', resolution='hourly'):
+        return os.path.join(self.root, vs_currency, resolution, f"{coin_id}.bin")
+
+    @staticmethod
+    def resolution_for(days):
+        return 'hourly' if days <= RESOLUTIONS['hourly'][1] else 'daily'
+
+    def read(self, coin_id, vs_currency='usd', resolution='hourly'):
+        """
+        Memory-map every stored record for a coin (an empty array when there are none)
+        """
+        path = self.path_for(coin_id, vs_currency, resolution)
+        try:
+            count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        except FileNotFoundError:
+            count = 0
+        if count == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        # Ignore a trailing partial record left by an interrupted append
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(count,))
+
+    def update(self, coin_id, vs_currency='usd', resolution='hourly', now=None):
+        """
+        Fetch and append the points newer than the last stored one, returning how many were added
+        """
+        step, backfill_days = RESOLUTIONS[resolution]
+        now = now or time.time()
+        path = self.path_for(coin_id, vs_currency, resolution)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._lock_for(path), open(path, 'ab') as f:
+            if fcntl is not None:
+                # Serializes batch worker processes updating the same coin
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                records = self.read(coin_id, vs_currency, resolution)
+                last_ms = int(records['t'][-1]) if len(records) else None
+                if last_ms is not None and now - last_ms / 1000 < step:
+                    return 0
+
+                start = last_ms / 1000 if last_ms is not None else now - backfill_days * 86400
+                points = self.coingecko.get_coin_price_range(coin_id, start, now, vs_currency=vs_currency)
+                if not points:
+                    return 0
+                new = thin_points(points, step, after_ms=last_ms)
+                f.write(new.tobytes())
+                return len(new)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def window(self, coin_id, days, vs_currency='usd', now=None):
+        """
+        Get (timestamps_ms, prices) for the last `days` days, updating the store first
+        """
+        resolution = self.resolution_for(days)
+        now = now or time.time()
+        try:
+            self.update(coin_id, vs_currency, resolution, now=now)
+        except Exception as e:
+            # A failed delta still leaves the stored history usable
+            print(f"⚠️ History update failed for {coin_id}: {e}")
+
+        records = self.read(coin_id, vs_currency, resolution)
+        start = np.searchsorted(records['t'], int((now - days * 86400) * 1000))
+        window = records[start:]
+        return np.array(window['t']), np.array(window['p'])
+
+    def get_history(self, coin_id, days=7, vs_currency='usd'):
+        """
+        Get a list of prices for a coin over the last `days` days, or None if nothing is stored
+        """
+        _, prices = self.window(coin_id, days, vs_currency)
+        return prices.tolist() if len(prices) else None
+
+    def _lock_for(self, path):
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+
+def thin_points(points, step, after_ms=None):
+    """
+    Keep the first [timestamp_ms, price] point in each `step`-second bucket,
+    dropping buckets at or before the one holding `after_ms`, so 5-minute
+    deltas land on the same grid as the hourly or daily backfill
+    """
+    values = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    values = values[np.argsort(values[:, 0], kind='stable')]
+    buckets = (values[:, 0] // (step * 1000)).astype(np.int64)
+
+    keep = np.insert(buckets[1:] != buckets[:-1], 0, True)
+    if after_ms is not None:
+        keep &= buckets > after_ms // (step * 1000)
+
+    records = np.empty(int(keep.sum()), dtype=RECORD_DTYPE)
+    records['t'] = values[keep, 0]
+    records['p'] = values[keep, 1]
+    return records
+
+
+def history_store_enabled():
+    """Whether price history is served from the local store (HISTORY_STORE_ENABLED, default on)"""
+    return os.getenv('HISTORY_STORE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.instrumentation import current_span
+
+try:
+    import fcntl
+except ImportError:  # Windows: the rate limit is per process only
+    fcntl = None
+
+load_dotenv()
+
+# Transient failures worth retrying; 429/503 responses carrying Retry-After wait that long
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per `per` seconds with bursts
+    of up to `capacity`. acquire() blocks until a token is available.
+
+    With a `state_path` the bucket lives in that file under an flock, so
+    every process using the same path (batch workers, concurrent CLI runs)
+    draws from one budget instead of each getting the full rate.
+    """
+
+    def __init__(self, rate, per=60.0, capacity=None, state_path=None):
+        self.rate = float(rate)
+        self.per = float(per)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.state_path = state_path if fcntl is not None else None
+        if self.state_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take `tokens`, sleeping until the bucket has refilled enough; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                if self.state_path:
+                    delay = self._take_shared(tokens)
+                else:
+                    delay = self._take(tokens)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def _take(self, tokens):
+        """Refill and take; returns 0 on success, else the seconds until enough tokens accrue"""
+        # Wall clock rather than monotonic: shared state is compared across processes
+        now = time.time()
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate / self.per)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0
+        return (tokens - self.tokens) * self.per / self.rate
+
+    def _take_shared(self, tokens):
+        with open(self.state_path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                state = f.read().split()
+                if len(state) == 2:
+                    self.tokens, self.updated = float(state[0]), float(state[1])
+                else:
+                    self.tokens, self.updated = self.capacity, time.time()
+                delay = self._take(tokens)
+                f.seek(0)
+                f.truncate()
+                f.write(f"{self.tokens} {self.updated}")
+                f.flush()
+                return delay
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _throttle(rate_limiter):
+    """Take a token, adding any wait to the current span's throttled_seconds"""
+    waited = rate_limiter.acquire()
+    span = current_span()
+    if waited and span is not None:
+        span.set(throttled_seconds=round(span.attrs.get('throttled_seconds', 0) + waited, 3))
+
+
+class RateLimitedRetry(Retry):
+    """
+    Retry that takes a token before every attempt it re-issues. urllib3
+    retries inside the adapter's send(), so without this a 429/5xx retry
+    storm would go out unmetered.
+    """
+
+    def __init__(self, *args, rate_limiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.rate_limiter = self.rate_limiter
+        return retry
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.rate_limiter is not None:
+            _throttle(self.rate_limiter)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that takes a token from a TokenBucket before every request it sends"""
+
+    def __init__(self, rate_limiter=None, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.rate_limiter is not None:
+            _throttle(self.rate_limiter)
+        return super().send(request, **kwargs)
+
+
+class HTTPClient(requests.Session):
+    """
+    requests.Session with a sized keep-alive pool, default connect/read
+    timeouts, urllib3 retries with exponential backoff that honor Retry-After,
+    and an optional token-bucket rate limit that every attempt, retries
+    included, draws from.
+    """
+
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None,
+                 retries=None, backoff=None, rate_limit=None, rate_state_path=None):
+        super().__init__()
+        pool_size = pool_size or int(os.getenv('HTTP_POOL_SIZE', 16))
+        self.timeout = (
+            connect_timeout or float(os.getenv('HTTP_CONNECT_TIMEOUT', 5)),
+            read_timeout or float(os.getenv('HTTP_READ_TIMEOUT', 30)),
+        )
+        retries = int(os.getenv('HTTP_RETRIES', 3)) if retries is None else retries
+        backoff = float(os.getenv('HTTP_BACKOFF', 0.5)) if backoff is None else backoff
+
+        self.rate_limiter = TokenBucket(rate_limit, state_path=rate_state_path) if rate_limit else None
+        retry = RateLimitedRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'POST']),
+            respect_retry_after_header=True,
+            # Hand the last response back so callers' raise_for_status() reports it
+            raise_on_status=False,
+            rate_limiter=self.rate_limiter,
+        )
+        adapter = RateLimitedAdapter(self.rate_limiter, pool_connections=pool_size,
+                                     pool_maxsize=pool_size, max_retries=retry)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(service):
+    """
+    Process-wide HTTPClient for a service ('coingecko' or 'quickchart'), so
+    every caller shares one connection pool; the rate limit is shared with
+    other processes too, through a state file in HTTP_RATE_STATE_DIR
+    """
+    with _clients_lock:
+        if service not in _clients:
+            _clients[service] = HTTPClient(rate_limit=_rate_limit(service),
+                                           rate_state_path=_rate_state_path(service))
+        return _clients[service]
+
+
+def _rate_limit(service):
+    # CoinGecko's public API allows roughly 30 calls/minute; QuickChart is not limited here
+    if service == 'coingecko':
+        return float(os.getenv('COINGECKO_RATE_LIMIT', 30)) or None
+    return None
+
+
+def _rate_state_path(service):
+    # The quota is per client IP, so every process on the machine shares one bucket
+    state_dir = os.getenv('HTTP_RATE_STATE_DIR', './assets/cache/ratelimit')
+    return os.path.join(state_dir, f"{service}.bucket") if state_dir else None
@@ -0,0 +1,306 @@
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """
+    One timed operation: an HTTP call, a chart render, a TTS synthesis or an
+    FFmpeg run. Callers fill in bytes, retries and free-form attributes while
+    the span is open; wall time, status and child CPU are filled in by the tracer.
+    """
+
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.id = next(_span_ids)
+        self.parent_id = parent.id if parent else None
+        self.attrs = attrs
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.cpu_user = 0.0
+        self.cpu_system = 0.0
+        self.status = 'ok'
+        self.error = None
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.seconds = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add_cpu(self, rusage):
+        """Charge a reaped child's CPU time (a resource.struct_rusage) to this span"""
+        self.cpu_user += rusage.ru_utime
+        self.cpu_system += rusage.ru_stime
+
+    def to_dict(self, run_id):
+        record = {
+            'run': run_id,
+            'span': self.name,
+            'id': self.id,
+            'parent': self.parent_id,
+            'start': round(self.started_at, 6),
+            'seconds': round(self.seconds, 6),
+            'status': self.status,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'retries': self.retries,
+            'cpu_user': round(self.cpu_user, 4),
+            'cpu_system': round(self.cpu_system, 4),
+            'thread': threading.current_thread().name,
+        }
+        if self.error:
+            record['error'] = self.error
+        record.update(self.attrs)
+        return record
+
+
+class Tracer:
+    """
+    Collects spans for one run into a JSONL trace (TRACE_DIR/trace_<run>.jsonl)
+    and keeps per-span-name totals that can be dumped in Prometheus text format.
+
+    Spans nest through a context variable, so a span opened inside another one
+    (in the same thread or asyncio task) records it as its parent.
+    """
+
+    def __init__(self, run_id=None, trace_dir=None, metrics_path=None, enabled=None):
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.enabled = trace_enabled() if enabled is None else enabled
+        self.trace_dir = trace_dir or os.getenv('TRACE_DIR', './assets/traces')
+        self.metrics_path = metrics_path or os.getenv('METRICS_FILE') or None
+        self.trace_path = os.path.join(self.trace_dir, f"trace_{self.run_id}.jsonl")
+        self.totals = {}
+        self._file = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Time the enclosed block as a span named `name`, yielding the Span
+        """
+        span = Span(name, parent=_current_span.get(), **attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            span.seconds = time.perf_counter() - span._start
+            _current_span.reset(token)
+            self.record(span)
+
+    def record(self, span):
+        with self._lock:
+            totals = self.totals.setdefault(span.name, {
+                'count': 0, 'errors': 0, 'seconds': 0.0, 'bytes_in': 0, 'bytes_out': 0,
+                'retries': 0, 'cpu_seconds': 0.0,
+            })
+            totals['count'] += 1
+            totals['errors'] += span.status != 'ok'
+            totals['seconds'] += span.seconds
+            totals['bytes_in'] += span.bytes_in
+            totals['bytes_out'] += span.bytes_out
+            totals['retries'] += span.retries
+            totals['cpu_seconds'] += span.cpu_user + span.cpu_system
+
+            if not self.enabled:
+                return
+            if self._file is None:
+                os.makedirs(self.trace_dir, exist_ok=True)
+                self._file = open(self.trace_path, 'a')
+            self._file.write(json.dumps(span.to_dict(self.run_id)) + '\n')
+            self._file.flush()
+
+    def prometheus_text(self):
+        """Render the per-span totals in the Prometheus text exposition format"""
+        metrics = [
+            ('spans_total', 'count', 'Completed spans'),
+            ('span_errors_total', 'errors', 'Spans that raised'),
+            ('span_seconds_total', 'seconds', 'Wall time spent inside spans'),
+            ('span_bytes_in_total', 'bytes_in', 'Bytes received or produced'),
+            ('span_bytes_out_total', 'bytes_out', 'Bytes sent'),
+            ('span_retries_total', 'retries', 'Retried attempts'),
+            ('span_cpu_seconds_total', 'cpu_seconds', 'CPU time of child processes'),
+        ]
+        with self._lock:
+            totals = {name: dict(values) for name, values in self.totals.items()}
+
+        lines = []
+        for metric, key, help_text in metrics:
+            lines.append(f"# HELP datavizchannel_{metric} {help_text}")
+            lines.append(f"# TYPE datavizchannel_{metric} counter")
+            for name in sorted(totals):
+                lines.append(f'datavizchannel_{metric}{{span="{name}",run="{self.run_id}"}} {totals[name][key]:g}')
+        return '\n'.join(lines) + '\n'
+
+    def write_metrics(self, path=None):
+        """Write the Prometheus dump to `path` (default METRICS_FILE), returning the path written"""
+        path = path or self.metrics_path
+        if not path:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+    def close(self):
+        """Flush the metrics dump and close the trace file"""
+        if self._closed:
+            return
+        self._closed = True
+        self.write_metrics()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """The tracer spans go to; created on first use for scripts that never call start_run"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+def start_run(run_id=None, **kwargs):
+    """
+    Start a new trace for a batch run, closing the previous one
+    """
+    global _tracer
+    tracer = Tracer(run_id, **kwargs)
+    with _tracer_lock:
+        previous, _tracer = _tracer, tracer
+    if previous is not None:
+        previous.close()
+    return tracer
+
+
+@atexit.register
+def _close_tracer():
+    # One hook for whichever tracer is current; replaced ones were closed by start_run
+    with _tracer_lock:
+        tracer = _tracer
+    if tracer is not None:
+        tracer.close()
+
+
+def span(name, **attrs):
+    """Open a span on the current tracer"""
+    return get_tracer().span(name, **attrs)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def run_command(cmd, span=None, check=True, input=None):
+    """
+    Run a subprocess to completion like subprocess.run(capture_output=True),
+    charging its CPU time to `span`. The child is reaped with os.wait4 so its
+    own rusage is measured even while other FFmpeg processes run alongside.
+    `input` is bytes or an iterable of byte chunks, written to stdin as the
+    iterable produces them so a long stream never sits in memory at once.
+    """
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        # Drain the pipes ourselves so Popen doesn't reap the child before wait4 can
+        stdout, stderr = _communicate(process, input, span)
+    except BaseException:
+        # The input iterable failed (e.g. a frame generator): don't leave a zombie behind
+        process.kill()
+        process.wait()
+        raise
+    if not hasattr(os, 'wait4'):
+        process.wait()
+    else:
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if span is not None:
+            span.add_cpu(rusage)
+
+    if span is not None:
+        span.bytes_in += len(stdout or b'')
+        span.set(returncode=process.returncode)
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def _communicate(process, input, span=None):
+    """Read stdout and stderr to EOF (and feed stdin) without waiting on the process"""
+    chunks = {'stdout': [], 'stderr': []}
+
+    def drain(name):
+        stream = getattr(process, name)
+        chunks[name].append(stream.read())
+        stream.close()
+
+    readers = [threading.Thread(target=drain, args=(name,), daemon=True) for name in chunks]
+    for reader in readers:
+        reader.start()
+    try:
+        if process.stdin:
+            try:
+                for chunk in ([input] if isinstance(input, (bytes, bytearray, memoryview)) else input):
+                    process.stdin.write(chunk)
+                    if span is not None:
+                        span.bytes_out += len(chunk)
+            except BrokenPipeError:
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+    except BaseException:
+        # Stop the child rather than let it finish on truncated input; the readers then see EOF
+        process.kill()
+        raise
+    finally:
+        for reader in readers:
+            reader.join()
+    return b''.join(chunks['stdout']), b''.join(chunks['stderr'])
+
+
+def trace_enabled():
+    """Whether spans are written to a JSONL trace (TRACE_ENABLED, default off)"""
+    return os.getenv('TRACE_ENABLED', 'false').lower() not in ('0', 'false', 'no')
+
+
+def record_response(span, response):
+    """Copy size, status and urllib3 retry count from a requests Response onto a span"""
+    span.bytes_in += len(response.content)
+    body = response.request.body if response.request is not None else None
+    span.bytes_out += len(body) if body else 0
+    retries = getattr(response.raw, 'retries', None)
+    span.retries += len(retries.history) if retries is not None else 0
+    span.set(status_code=response.status_code)
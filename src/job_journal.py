@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+from src.artifacts import content_key
+
+load_dotenv()
+
+
+class JobJournal:
+    """
+    Persistent journal of batch jobs and what each of their stages produced.
+
+    Every stage result (market data, chosen templates and script, chart,
+    narration, video) is stored with a hash of the inputs it was built from
+    and the artifact files it wrote. When a batch is rerun under the same
+    batch id, a stage whose input hash still matches and whose artifacts are
+    still on disk is taken from the journal instead of being redone, so a
+    crashed or timed-out batch only pays for the work that is left. SQLite in
+    WAL mode lets every batch worker process write to the same file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('JOB_JOURNAL_PATH', './assets/cache/jobs.sqlite3')
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' batch_id TEXT, job_key TEXT, job_index INTEGER, spec TEXT, status TEXT,'
+            ' video_path TEXT, error TEXT, updated_at REAL,'
+            ' PRIMARY KEY (batch_id, job_key))'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS stages ('
+            ' batch_id TEXT, job_key TEXT, stage TEXT, input_hash TEXT, output TEXT,'
+            ' artifacts TEXT, updated_at REAL,'
+            ' PRIMARY KEY (batch_id, job_key, stage))'
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def input_hash(*parts):
+        """Hash the inputs of a stage (anything JSON-serializable) into a stable key"""
+        return content_key(*parts, length=64)
+
+    @classmethod
+    def job_keys(cls, jobs):
+        """
+        Stable keys for a list of job specs; identical specs are told apart by their occurrence
+        """
+        seen = {}
+        keys = []
+        for job in jobs:
+            spec = cls.input_hash(job)
+            seen[spec] = seen.get(spec, 0) + 1
+            keys.append(cls.input_hash(spec, seen[spec])[:24])
+        return keys
+
+    def register_jobs(self, batch_id, jobs, keys):
+        """Record a batch's jobs as pending; jobs already journaled keep their state"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO jobs (batch_id, job_key, job_index, spec, status, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                [(batch_id, key, index, json.dumps(job, default=str), 'pending', now)
+                 for index, (job, key) in enumerate(zip(jobs, keys))]
+            )
+            self._conn.commit()
+
+    def start_job(self, batch_id, job_key):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE batch_id = ? AND job_key = ?",
+                (time.time(), batch_id, job_key)
+            )
+            self._conn.commit()
+
+    def finish_job(self, batch_id, job_key, success, video_path=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, video_path = ?, error = ?, updated_at = ?'
+                ' WHERE batch_id = ? AND job_key = ?',
+                ('done' if success else 'failed', video_path, error, time.time(), batch_id, job_key)
+            )
+            self._conn.commit()
+
+    def completed(self, batch_id):
+        """
+        {job_key: video_path} for the batch's finished jobs whose videos still exist
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_key, video_path FROM jobs WHERE batch_id = ? AND status = 'done'", (batch_id,)
+            ).fetchall()
+        return {job_key: path for job_key, path in rows if path and os.path.exists(path)}
+
+    def get_stage(self, batch_id, job_key, stage, input_hash):
+        """
+        The recorded output of a stage, or None when it is missing, was
+        built from different inputs, or one of its artifacts is gone
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT input_hash, output, artifacts FROM stages'
+                ' WHERE batch_id = ? AND job_key = ? AND stage = ?',
+                (batch_id, job_key, stage)
+            ).fetchone()
+        if row is None or row[0] != input_hash:
+            return None
+        if not all(os.path.exists(path) for path in json.loads(row[2])):
+            return None
+        return json.loads(row[1])
+
+    def record_stage(self, batch_id, job_key, stage, input_hash, output, artifacts=()):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO stages (batch_id, job_key, stage, input_hash, output, artifacts, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (batch_id, job_key, stage, input_hash, json.dumps(output, default=str),
+                 json.dumps(list(artifacts)), time.time())
+            )
+            self._conn.commit()
+
+    def referenced_artifacts(self, since=None):
+        """
+        Files a rerun may still need: stage artifacts and videos of jobs
+        updated after `since` (epoch seconds), whatever their status. A job
+        being run is touched by start_job, so it is always within the window;
+        abandoned or failed batches stop pinning their files once they age out.
+        """
+        since = time.time() if since is None else since
+        with self._lock:
+            stage_rows = self._conn.execute(
+                'SELECT s.artifacts FROM stages s JOIN jobs j'
+                ' ON s.batch_id = j.batch_id AND s.job_key = j.job_key'
+                ' WHERE j.updated_at >= ?', (since,)
+            ).fetchall()
+            video_rows = self._conn.execute(
+                'SELECT video_path FROM jobs WHERE video_path IS NOT NULL AND updated_at >= ?', (since,)
+            ).fetchall()
+        paths = {path for (artifacts,) in stage_rows for path in json.loads(artifacts)}
+        paths.update(path for (path,) in video_rows)
+        return paths
+
+    def prune(self, before):
+        """Forget jobs (and their stages) last updated before `before`; returns how many"""
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM stages WHERE EXISTS (SELECT 1 FROM jobs j WHERE j.batch_id = stages.batch_id'
+                ' AND j.job_key = stages.job_key AND j.updated_at < ?)', (before,)
+            )
+            count = self._conn.execute('DELETE FROM jobs WHERE updated_at < ?', (before,)).rowcount
+            self._conn.commit()
+        return count
+
+    def close(self):
+        self._conn.close()
+
+
+def artifact_paths(output):
+    """Files referenced by a stage output: a path, a list of paths or a {format: path} dict"""
+    if isinstance(output, str):
+        return [output]
+    if isinstance(output, dict):
+        return [path for path in output.values() if isinstance(path, str)]
+    if isinstance(output, (list, tuple)):
+        return [path for path in output if isinstance(path, str)]
+    return []
+
+
+def journal_enabled():
+    """Whether batch runs keep a resumable job journal (JOB_JOURNAL_ENABLED, default on)"""
+    return os.getenv('JOB_JOURNAL_ENABLED', 'true').lower() not in ('0', 'false', 'no')
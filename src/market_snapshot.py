@@ -0,0 +1,103 @@
+import numpy as np
+
+
+def _column(markets, key):
+    return np.array([np.nan if coin.get(key) is None else coin[key] for coin in markets], dtype=np.float64)
+
+
+class MarketSnapshot:
+    """
+    Columnar view of one or more /coins/markets pages.
+
+    Holds ids, prices, 24h change and market cap as NumPy arrays plus the 7-day
+    sparklines as a single (coins, points) matrix padded with NaN, so gainers,
+    losers and other top-k queries are answered locally with argpartition
+    instead of refetching and re-sorting the payload.
+    """
+
+    def __init__(self, markets, vs_currency='usd'):
+        self.coins = list(markets)
+        self.vs_currency = vs_currency
+        self.ids = np.array([coin['id'] for coin in self.coins], dtype=object)
+        self.prices = _column(self.coins, 'current_price')
+        self.change_24h = _column(self.coins, 'price_change_percentage_24h')
+        self.market_caps = _column(self.coins, 'market_cap')
+        self.sparklines = self._sparkline_matrix(self.coins)
+        self._index = {coin_id: i for i, coin_id in enumerate(self.ids)}
+
+    @staticmethod
+    def _sparkline_matrix(markets):
+        series = [(coin.get('sparkline_in_7d') or {}).get('price') or [] for coin in markets]
+        width = max((len(s) for s in series), default=0)
+        matrix = np.full((len(series), width), np.nan)
+        for row, values in enumerate(series):
+            matrix[row, :len(values)] = [np.nan if v is None else v for v in values]
+        return matrix
+
+    @classmethod
+    def fetch(cls, coingecko, size=50, vs_currency='usd'):
+        """
+        Fetch the top `size` coins by market cap, paging 250 at a time
+        """
+        per_page = min(size, 250)
+        markets = []
+        page = 1
+        while len(markets) < size:
+            batch = coingecko.get_coin_markets(vs_currency=vs_currency, per_page=per_page,
+                                               page=page, sparkline=True)
+            if not batch:
+                if not markets:
+                    return None
+                break
+            markets.extend(batch)
+            if len(batch) < per_page:
+                break
+            page += 1
+        return cls(markets[:size], vs_currency=vs_currency)
+
+    def __len__(self):
+        return len(self.coins)
+
+    def __contains__(self, coin_id):
+        return coin_id in self._index
+
+    def coin(self, coin_id):
+        """Return the raw markets entry for a coin, or None"""
+        index = self._index.get(coin_id)
+        return None if index is None else self.coins[index]
+
+    def sparkline(self, coin_id):
+        """Return a coin's 7-day sparkline as a float array without padding, or None"""
+        index = self._index.get(coin_id)
+        if index is None:
+            return None
+        row = self.sparklines[index]
+        row = row[np.isfinite(row)]
+        return row if row.size else None
+
+    def top_k(self, values, k, largest=True, mask=None):
+        """
+        Indices of the k largest (or smallest) finite values, best first
+        """
+        candidates = np.flatnonzero(np.isfinite(values) if mask is None else mask & np.isfinite(values))
+        if candidates.size == 0 or k <= 0:
+            return candidates[:0]
+        keys = -values[candidates] if largest else values[candidates]
+        if k < candidates.size:
+            part = np.argpartition(keys, k - 1)[:k]
+            candidates, keys = candidates[part], keys[part]
+        return candidates[np.argsort(keys, kind='stable')]
+
+    def top_gainers(self, limit=5):
+        """Coins with the largest positive 24h change"""
+        indices = self.top_k(self.change_24h, limit, largest=True, mask=self.change_24h > 0)
+        return [self.coins[i] for i in indices]
+
+    def top_losers(self, limit=5):
+        """Coins with the largest negative 24h change"""
+        indices = self.top_k(self.change_24h, limit, largest=False, mask=self.change_24h < 0)
+        return [self.coins[i] for i in indices]
+
+    def top_by_market_cap(self, limit=10):
+        """Largest coins by market cap"""
+        return [self.coins[i] for i in self.top_k(self.market_caps, limit, largest=True)]
@@ -0,0 +1,368 @@
+import asyncio
+import contextvars
+import functools
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from src.artifacts import mark_used, write_atomic
+from src.background_library import background_prerender_enabled
+from src.chart_generator import QuickChartGenerator
+from src.coingecko_api import CoingeckoAPI
+from src.encode_profiles import split_cores
+from src.instrumentation import span, start_run
+from src.job_journal import JobJournal, artifact_paths
+from src.price_history import PriceHistoryProvider
+from src.template_manager import TemplateManager, SEOGenerator
+from src.tts_generator import TTSGenerator
+from src.video_composer import VideoComposer, primary_output
+
+SCRIPT_CATEGORIES = {
+    'bitcoin': 'bitcoin_focus',
+    'gainers': 'top_gainer',
+    'coin': 'coin_focus',
+}
+
+
+class VideoPipeline:
+    """
+    Asyncio batch engine for advanced (templated) videos.
+
+    Each job goes fetch -> (chart render || script + TTS) -> FFmpeg compose,
+    and jobs overlap with each other: fetches run on an I/O thread pool and
+    TTS on the event loop, both under bounded semaphores; chart renders go to
+    a thread pool and FFmpeg encodes run from worker threads, at most one per
+    core. Batch wall time tracks the slowest stage instead of the sum.
+
+    Every run gets its own instrumentation trace; stages and the HTTP,
+    render, TTS and FFmpeg calls inside them are recorded as nested spans.
+    """
+
+    def __init__(self, coingecko=None, chart_gen=None, tts=None, video_composer=None,
+                 template_manager=None, seo_generator=None, fetch_concurrency=None,
+                 tts_concurrency=None, render_workers=None, encode_workers=None, encode_profile=None,
+                 encode_threads=None, journal=None):
+        self.coingecko = coingecko or CoingeckoAPI()
+        self.history = PriceHistoryProvider(self.coingecko)
+        self.chart_gen = chart_gen or QuickChartGenerator()
+        self.tts = tts or TTSGenerator()
+        self.video_composer = video_composer or VideoComposer()
+        self.template_manager = template_manager or TemplateManager()
+        self.seo_generator = seo_generator or SEOGenerator()
+
+        cores = os.cpu_count() or 1
+        self.fetch_concurrency = fetch_concurrency or int(os.getenv('PIPELINE_FETCH_CONCURRENCY', 4))
+        self.tts_concurrency = tts_concurrency or int(os.getenv('PIPELINE_TTS_CONCURRENCY', 4))
+        self.render_workers = render_workers or int(os.getenv('PIPELINE_RENDER_WORKERS', min(4, cores)))
+        self.encode_workers = encode_workers or int(os.getenv('PIPELINE_ENCODE_WORKERS', cores))
+        self.encode_profile = encode_profile
+        # x264 threads per encode; by default the cores are split between concurrent encodes
+        self.encode_threads = encode_threads
+        # Optional JobJournal: jobs carrying a batch_id and job_key reuse journaled stages
+        self.journal = journal
+
+    def run_sync(self, jobs, run_id=None):
+        """Run a batch of jobs from synchronous code"""
+        return asyncio.run(self.run(jobs, run_id))
+
+    async def run(self, jobs, run_id=None):
+        """
+        Run jobs concurrently, returning one result dict per job in order.
+        
+        A job is {'video_type': 'bitcoin' | 'gainers' | 'coin'} plus optional
+        'coin_id' (required for 'coin'; overrides the coin for the others),
+        'rank' (which gainer, 1-based), 'background' / 'voice' / 'chart_style'
+        template overrides and 'name' (fixed output file prefix; without one
+        the video is named after its inputs and reused when it already exists).
+        """
+        self._run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        tracer = start_run(self._run_id)
+        try:
+            with span('pipeline.run', jobs=len(jobs)):
+                return await self._run(jobs)
+        finally:
+            tracer.close()
+            if tracer.enabled:
+                print(f"📈 Trace written to {tracer.trace_path}")
+
+    async def _run(self, jobs):
+        self._fetch_semaphore = asyncio.Semaphore(self.fetch_concurrency)
+        self._tts_semaphore = asyncio.Semaphore(self.tts_concurrency)
+        self._encode_semaphore = asyncio.Semaphore(self.encode_workers)
+        # Cores are split between the encodes that can actually run side by side
+        _, self._encode_threads = split_cores(min(self.encode_workers, max(1, len(jobs))))
+        self._encode_threads = self.encode_threads or self._encode_threads
+
+        with ThreadPoolExecutor(self.fetch_concurrency) as io_pool, \
+                ThreadPoolExecutor(self.render_workers) as render_pool, \
+                ThreadPoolExecutor(self.encode_workers) as encode_pool:
+            self._io_pool = io_pool
+            self._render_pool = render_pool
+            self._encode_pool = encode_pool
+
+            if not self.video_composer.check_ffmpeg():
+                return [self._result(job) for job in jobs]
+            # Shared inputs are prepared once up front so concurrent jobs don't race to create them
+            with span('stage.snapshot'):
+                await self._in_thread(io_pool, self.coingecko.get_market_snapshot)
+            if background_prerender_enabled():
+                # Missing template backgrounds are rendered once here, not inside each compose
+                with span('stage.backgrounds'):
+                    await self._in_thread(io_pool, functools.partial(
+                        self.video_composer.backgrounds.prerender,
+                        self.template_manager.templates['backgrounds'], durations=(15,)
+                    ))
+
+            return await asyncio.gather(*(self.run_job(job, index) for index, job in enumerate(jobs)))
+
+    @staticmethod
+    def _result(job):
+        return {'job': job, 'success': False, 'video_path': None, 'timings': {}}
+
+    async def run_job(self, job, index=0):
+        """
+        Run a single job through every stage. Besides per-stage timings, the
+        result carries the job's wall time in 'seconds' (chart and TTS overlap,
+        so the stages don't add up to it)
+        """
+        started = time.perf_counter()
+        result = self._result(job)
+        timings = result['timings']
+        video_type = job['video_type']
+        tag = f"job{index}"
+        name = job.get('name')
+
+        journaled = self.journal is not None and 'job_key' in job
+        if journaled:
+            self.journal.start_job(job['batch_id'], job['job_key'])
+        stage_hash = JobJournal.input_hash
+
+        try:
+            fetch_hash = stage_hash(video_type, job.get('coin_id'), job.get('rank'))
+            fetched = await self._timed(timings, 'fetch', self._journaled(
+                job, 'fetch', fetch_hash, lambda: self._fetch(job), artifacts=False), tag)
+            if not fetched:
+                return result
+            coin_data, price_history = fetched
+
+            # Templates and script are journaled too, so a resumed job keeps its
+            # random picks and the chart/narration already made for them stay valid
+            plan_hash = stage_hash(fetch_hash, job.get('background'), job.get('voice'), job.get('chart_style'))
+            plan = await self._journaled(job, 'plan', plan_hash,
+                                         lambda: self._plan(job, video_type, coin_data), artifacts=False)
+            templates, script = plan['templates'], plan['script']
+            print(f"🎨 [{tag}] Templates: BG={templates['background']}, "
+                  f"Voice={templates['voice']}, Chart={templates['chart_style']}")
+
+            chart_hash = stage_hash(price_history, coin_data['price_change_percentage_24h'],
+                                    templates['chart_style_config'], type(self.chart_gen.renderer).__name__)
+            tts_hash = stage_hash(script, templates['voice'])
+            chart_path, audio_path = await asyncio.gather(
+                self._timed(timings, 'chart', self._journaled(
+                    job, 'chart', chart_hash,
+                    lambda: self._render_chart(coin_data, price_history, templates)), tag),
+                self._timed(timings, 'tts', self._journaled(
+                    job, 'tts', tts_hash,
+                    lambda: self._synthesize(coin_data, script, templates)), tag),
+            )
+            if not chart_path or not audio_path:
+                return result
+
+            composer = self.video_composer
+            compose_hash = stage_hash(chart_hash, tts_hash, coin_data['id'], templates['background_config'],
+                                      self.encode_profile or composer.encode_profile, composer.chart_animation,
+                                      composer.output_formats, composer.width, composer.height)
+            video_path = await self._timed(timings, 'compose', self._journaled(
+                job, 'compose', compose_hash,
+                lambda: self._compose(coin_data, chart_path, audio_path, templates, name, tag)), tag)
+            if not video_path:
+                return result
+            if isinstance(video_path, dict):
+                # Multi-format compose: the first format is the primary video
+                result['outputs'] = video_path
+                video_path = primary_output(video_path)
+
+            self._write_metadata(video_path, video_type, coin_data, script, templates)
+            result.update(success=True, video_path=video_path)
+        except Exception as e:
+            print(f"❌ [{tag}] {video_type} video failed: {e}")
+            result['error'] = str(e)
+        finally:
+            result['seconds'] = time.perf_counter() - started
+            if journaled:
+                self.journal.finish_job(job['batch_id'], job['job_key'], result['success'],
+                                        result['video_path'], result.get('error'))
+        return result
+
+    async def _journaled(self, job, stage, input_hash, run, artifacts=True):
+        """
+        Run a stage (`run` returns its awaitable), or take its output from the
+        job journal when the same inputs already produced it and, for file
+        stages (`artifacts`), those files still exist
+        """
+        if self.journal is None or 'job_key' not in job:
+            return await run()
+        batch_id, job_key = job['batch_id'], job['job_key']
+        recorded = self.journal.get_stage(batch_id, job_key, stage, input_hash)
+        if recorded is not None:
+            if artifacts:
+                mark_used(artifact_paths(recorded))
+            print(f"♻️ [{job_key[:8]}] {stage} reused from the job journal")
+            return recorded
+        output = await run()
+        if output:
+            self.journal.record_stage(batch_id, job_key, stage, input_hash, output,
+                                      artifact_paths(output) if artifacts else ())
+        return output
+
+    async def _plan(self, job, video_type, coin_data):
+        # Templates named in the job are used as given, the rest are picked at random
+        bg_name, bg_config = self.template_manager.get_background_template(job.get('background'))
+        style_name, style_config = self.template_manager.get_chart_style(job.get('chart_style'))
+        templates = {
+            'background': bg_name,
+            'background_config': bg_config,
+            'voice': self.template_manager.get_voice_template(job.get('voice')),
+            'chart_style': style_name,
+            'chart_style_config': style_config,
+        }
+        return {'templates': templates, 'script': self._script(video_type, coin_data)}
+
+    @staticmethod
+    async def _timed(timings, stage, awaitable, tag=None):
+        start = time.perf_counter()
+        try:
+            with span(f"stage.{stage}", job=tag):
+                return await awaitable
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    @staticmethod
+    async def _in_thread(pool, func, *args):
+        """run_in_executor that carries the current span over to the worker thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, contextvars.copy_context().run, func, *args)
+
+    async def _fetch(self, job):
+        async with self._fetch_semaphore:
+            return await self._in_thread(self._io_pool, self._fetch_sync, job)
+
+    def _fetch_sync(self, job):
+        video_type = job['video_type']
+        if video_type not in SCRIPT_CATEGORIES:
+            print(f"❌ Unknown video type: {video_type}")
+            return None
+
+        coin_id = job.get('coin_id') or ('bitcoin' if video_type == 'bitcoin' else None)
+        if coin_id:
+            coin_data = self.coingecko.get_coin_market(coin_id)
+        elif video_type == 'gainers':
+            rank = int(job.get('rank') or 1)
+            gainers = self.coingecko.get_top_gainers(limit=rank)
+            coin_data = gainers[rank - 1] if gainers and len(gainers) >= rank else None
+        else:
+            print(f"❌ '{video_type}' jobs need a coin_id")
+            return None
+
+        if not coin_data:
+            print(f"❌ Failed to fetch {video_type} data")
+            return None
+        price_history = self.history.get_history(coin_data['id'], days=7, coin_data=coin_data)
+        if not price_history:
+            print("❌ Failed to get price history")
+            return None
+        return coin_data, price_history
+
+    def _script(self, video_type, coin_data):
+        change = coin_data['price_change_percentage_24h']
+        script_data = {
+            'price': coin_data['current_price'],
+            'abs_change': abs(change),
+            'change_direction': 'up' if change >= 0 else 'down',
+            'name': coin_data['name'],
+            'change': change
+        }
+        template = self.template_manager.get_script_template(SCRIPT_CATEGORIES[video_type])
+        return self.template_manager.format_script(template, script_data)
+
+    async def _render_chart(self, coin_data, price_history, templates):
+        return await self._in_thread(self._render_pool, self._render_chart_sync,
+                                     coin_data, price_history, templates)
+
+    def _render_chart_sync(self, coin_data, price_history, templates):
+        # Named after its inputs: a chart already drawn for the same series and style is reused
+        return self.chart_gen.save_sparkline_chart(
+            data=price_history,
+            coin_name=coin_data['id'],
+            price_change_24h=coin_data['price_change_percentage_24h'],
+            filename=f"{templates['chart_style']}_chart",
+            width=800, height=400,
+            line_color=templates['chart_style_config']['line'],
+            fill_color=templates['chart_style_config']['fill']
+        )
+
+    async def _synthesize(self, coin_data, script, templates):
+        async with self._tts_semaphore:
+            # Named after script and voice, so repeated narration is synthesized once
+            return await self.tts.generate_audio(script, voice=templates['voice'], prefix=coin_data['id'])
+
+    async def _compose(self, coin_data, chart_path, audio_path, templates, name, tag):
+        output_name = f"{coin_data['id']}_{name}" if name else None
+        build = functools.partial(
+            self.video_composer.build_compose_command,
+            chart_path, audio_path, coin_data['id'], coin_data['price_change_percentage_24h'],
+            duration=15, output_name=output_name, background=templates['background_config'],
+            profile=self.encode_profile, threads=self._encode_threads
+        )
+        command = await self._in_thread(self._io_pool, build)
+        if not command:
+            return None
+        cmd, output_path = command
+        if output_name is None and self.video_composer.outputs_exist(output_path):
+            mark_used(output_path)
+            print(f"♻️ [{tag}] Video reused: {output_path}")
+            return output_path
+
+        # A plain thread per encode (rather than an asyncio subprocess) lets
+        # run_ffmpeg reap the child itself and record its CPU time
+        async with self._encode_semaphore:
+            print(f"🎬 [{tag}] Composing video...")
+            try:
+                await self._in_thread(self._encode_pool, self._encode, cmd, output_path,
+                                      chart_path, audio_path, coin_data['id'])
+            except subprocess.CalledProcessError as e:
+                print(f"❌ [{tag}] Error composing video (exit {e.returncode})")
+                print(f"FFmpeg stderr: {e.stderr.decode(errors='replace') if e.stderr else 'No stderr'}")
+                return None
+        print(f"✅ [{tag}] Video composed successfully: {output_path}")
+        return output_path
+
+    def _encode(self, cmd, output_path, chart_path, audio_path, coin_id):
+        # The draw-on chart animation is generated here, as FFmpeg consumes it
+        frames = self.video_composer.chart_frames(chart_path, audio_path, duration=15)
+        return self.video_composer.run_ffmpeg(
+            cmd, 'compose', output_path, input=frames,
+            coin=coin_id, profile=self.encode_profile or self.video_composer.encode_profile
+        )
+
+    def _write_metadata(self, video_path, video_type, coin_data, script, templates):
+        seo_title = self.seo_generator.generate_seo_title(coin_data, video_type)
+        seo_tags = self.seo_generator.generate_tags(coin_data)
+
+        print(f"🎉 Advanced video generated!")
+        print(f"📹 Video: {video_path}")
+        print(f"🏷️ SEO Title: {seo_title}")
+        print(f"🏷️ SEO Tags: {', '.join(seo_tags)}")
+
+        metadata_path = video_path.replace('.mp4', '_metadata.txt')
+        # Jobs with identical inputs share a video, so its metadata is replaced atomically too
+        write_atomic(metadata_path, (
+            f"TITLE: {seo_title}\n"
+            f"TAGS: {', '.join(seo_tags)}\n"
+            f"DESCRIPTION: {script}\n"
+            f"TEMPLATES: BG={templates['background']}, Voice={templates['voice']}, "
+            f"Chart={templates['chart_style']}\n"
+        ).encode('utf-8'))
+        return metadata_path
@@ -0,0 +1,83 @@
+import numpy as np
+
+from src.history_store import HistoryStore, history_store_enabled
+
+# /coins/markets?sparkline=true returns 7 days of hourly prices per coin
+SPARKLINE_DAYS = 7
+
+
+def align_histories(series, points=None):
+    """
+    Resample [timestamp_ms, price] series onto one evenly spaced time grid.
+
+    The grid spans the earliest to the latest timestamp across all series
+    with `points` steps (default: the longest series). Each row is linearly
+    interpolated with np.interp and is NaN outside its own time range, or
+    entirely NaN when the series is missing. Returns (timestamps_ms, matrix).
+    """
+    arrays = [np.asarray(s, dtype=np.float64).reshape(-1, 2) if s else None for s in series]
+    present = [a for a in arrays if a is not None and len(a)]
+    if not present:
+        return np.empty(0), np.full((len(series), 0), np.nan)
+
+    points = points or max(len(a) for a in present)
+    start = min(a[0, 0] for a in present)
+    end = max(a[-1, 0] for a in present)
+    grid = np.linspace(start, end, points)
+
+    matrix = np.full((len(series), points), np.nan)
+    for row, values in enumerate(arrays):
+        if values is None or not len(values):
+            continue
+        # market_chart is sorted by time, but repeated timestamps would confuse np.interp
+        times, first = np.unique(values[:, 0], return_index=True)
+        matrix[row] = np.interp(grid, times, values[first, 1], left=np.nan, right=np.nan)
+    return grid, matrix
+
+
+class PriceHistoryProvider:
+    """
+    Serve price series for charts, reusing data that is already in hand.
+
+    7-day requests are answered from the markets sparkline (168 hourly points)
+    carried by the coin entry or the shared MarketSnapshot. Other ranges, or
+    coins outside the snapshot, come from the incremental HistoryStore, which
+    only downloads points newer than what it already holds; with the store
+    disabled they fall back to /coins/{id}/market_chart.
+    """
+
+    def __init__(self, coingecko, snapshot=None, store=None):
+        self.coingecko = coingecko
+        self.snapshot = snapshot
+        if store is None and history_store_enabled():
+            store = HistoryStore(coingecko)
+        self.store = store
+
+    def get_history(self, coin_id, days=7, vs_currency='usd', coin_data=None):
+        """
+        Get a list of prices for a coin over the last `days` days
+        """
+        if days == SPARKLINE_DAYS:
+            series = self._sparkline(coin_id, vs_currency, coin_data)
+            if series is not None:
+                return series
+        # The store holds bounded numeric windows; days='max' goes to the API
+        if self.store and isinstance(days, (int, float)):
+            series = self.store.get_history(coin_id, days=days, vs_currency=vs_currency)
+            if series:
+                return series
+        return self.coingecko.get_coin_price_history(coin_id, vs_currency=vs_currency, days=days)
+
+    def _sparkline(self, coin_id, vs_currency, coin_data):
+        if coin_data is not None:
+            prices = (coin_data.get('sparkline_in_7d') or {}).get('price')
+            if prices:
+                return [p for p in prices if p is not None]
+
+        snapshot = self.snapshot
+        if snapshot is None and vs_currency == 'usd':
+            snapshot = self.snapshot = self.coingecko.get_market_snapshot()
+        if snapshot is None or snapshot.vs_currency != vs_currency:
+            return None
+        series = snapshot.sparkline(coin_id)
+        return None if series is None else series.tolist()
@@ -43,6 +43,11 @@ class TemplateManager:
                     "{name} is on fire today, reaching ${price:,}, up {change:.1f} percent in 24 hours.",
                     "The biggest gainer: {name} at ${price:,}, soaring {change:.1f} percent higher."
                 ],
+                'coin_focus': [
+                    "{name} is trading at ${price:,}, {change_direction} {abs_change:.1f} percent today.",
+                    "Let's look at {name}. Currently at ${price:,}, moving {change_direction} {abs_change:.1f} percent.",
+                    "{name} update: ${price:,}, {change_direction} {abs_change:.1f} percent in the last 24 hours."
+                ],
                 'market_summary': [
                     "Market update: Bitcoin at ${btc_price:,}, while {gainer_name} leads gains with {gainer_change:.1f} percent.",
                     "Today's crypto snapshot: Bitcoin {btc_change:+.1f} percent, top performer is {gainer_name} up {gainer_change:.1f} percent.",
@@ -73,20 +78,30 @@ class TemplateManager:
             return random.choice(list(self.templates[template_type].values()))
         return None
     
-    def get_background_template(self):
-        """Get random background template"""
+    def get_background_template(self, name=None):
+        """Get a background template by name, or a random one"""
+        if name:
+            return name, self._named('backgrounds', name)
         bg_name, bg_config = random.choice(list(self.templates['backgrounds'].items()))
         return bg_name, bg_config
     
-    def get_voice_template(self):
-        """Get random voice template"""
-        return random.choice(self.templates['voices'])
+    def get_voice_template(self, name=None):
+        """Get random voice template (any Edge TTS voice name is accepted as an override)"""
+        return name or random.choice(self.templates['voices'])
     
-    def get_chart_style(self):
-        """Get random chart style"""
+    def get_chart_style(self, name=None):
+        """Get a chart style by name, or a random one"""
+        if name:
+            return name, self._named('chart_styles', name)
         style_name, style_config = random.choice(list(self.templates['chart_styles'].items()))
         return style_name, style_config
     
+    def _named(self, template_type, name):
+        if name not in self.templates[template_type]:
+            available = ', '.join(self.templates[template_type])
+            raise ValueError(f"Unknown {template_type} template: {name} (available: {available})")
+        return self.templates[template_type][name]
+    
     def get_script_template(self, category: str):
         """Get random script template"""
         return random.choice(self.templates['script_templates'][category])
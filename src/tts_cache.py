@@ -0,0 +1,124 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class TTSCache:
+    """
+    Content-addressed store of synthesized MP3s keyed on (normalized text, voice).
+
+    Narration comes from a handful of templates with rounded prices, so the
+    same sentence in the same voice is requested again and again. Each clip
+    is stored once under the hash of its text and voice; hits are served as
+    a hardlink (or a copy across filesystems) and the least recently used
+    clips are dropped once the cache is over its size budget. The budget
+    counts the bytes only the cache holds; clips still linked from AUDIO_DIR
+    are accounted (and collected) there by src/asset_gc.py.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv('TTS_CACHE_DIR', './assets/cache/tts')
+        self.max_bytes = max_bytes or int(os.getenv('TTS_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        # Running estimate of the cache size, so only stores that push it over
+        # the budget walk the directory; None until the first walk
+        self._bytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(clean_text, voice):
+        """Hash whitespace-normalized text and the voice into a cache key"""
+        normalized = ' '.join(clean_text.split())
+        return hashlib.sha256(f"{voice}\n{normalized}".encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.mp3")
+
+    def fetch(self, key, output_path):
+        """
+        Materialize a cached clip at output_path, returning False on a miss
+        """
+        cached_path = self.path_for(key)
+        if not os.path.exists(cached_path):
+            return False
+
+        # Never write through an existing file: it may be a hardlink to another clip
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+        try:
+            try:
+                os.link(cached_path, output_path)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                shutil.copyfile(cached_path, output_path)
+            # Bump mtime so eviction sees this clip as recently used
+            os.utime(cached_path)
+        except FileNotFoundError:
+            # Evicted by another process since the exists() check: a miss,
+            # unless the clip was already linked before it went
+            return os.path.exists(output_path)
+        return True
+
+    def store(self, key, source_path):
+        """Copy a freshly synthesized clip into the cache"""
+        cached_path = self.path_for(key)
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached_path), suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, cached_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if self._bytes is not None:
+            self._bytes += os.path.getsize(source_path)
+        if self._bytes is None or self._bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used clips until the cache is back under 90% of
+        max_bytes, leaving headroom so the next stores don't each walk again.
+        The walk also resyncs the running size with what other processes stored.
+        Clips still hardlinked from AUDIO_DIR count as 0 bytes and are kept:
+        deleting them would free nothing (see _disk_bytes in src/asset_gc.py)
+        """
+        target = self.max_bytes * 0.9
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.mp3'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_nlink > 1:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            self._bytes = total
+            return
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._bytes = total
+
+
+def tts_cache_enabled():
+    """Whether the TTS audio cache is turned on (TTS_CACHE_ENABLED, default on)"""
+    return os.getenv('TTS_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
@@ -1,16 +1,27 @@
 import asyncio
 import edge_tts
 import os
-from datetime import datetime
 from dotenv import load_dotenv
 
+from src.artifacts import mark_used, partial_path
+from src.instrumentation import span
+from src.tts_cache import TTSCache, tts_cache_enabled
+
 load_dotenv()
 
 class TTSGenerator:
-    def __init__(self):
+    def __init__(self, communicate_factory=None, cache=None):
         self.audio_dir = os.getenv('AUDIO_DIR', './assets/audio')
         os.makedirs(self.audio_dir, exist_ok=True)
         
+        # Anything called as factory(text, voice) returning an object with an
+        # async save(path) works here, e.g. a local stub in place of edge-tts
+        self.communicate_factory = communicate_factory or edge_tts.Communicate
+        
+        if cache is None and tts_cache_enabled():
+            cache = TTSCache()
+        self.cache = cache
+        
         # Available voices - using high-quality English voices
         self.voices = [
             'en-US-JennyNeural',      # Female, natural
@@ -21,37 +32,118 @@ class TTSGenerator:
             'en-GB-RyanNeural',       # British male
         ]
     
-    async def generate_audio(self, text, voice=None, output_filename=None):
+    @staticmethod
+    def clean_text(text):
+        """Spell out symbols for better TTS"""
+        return text.replace('$', ' dollars ').replace('%', ' percent ')
+    
+    def audio_filename(self, text, voice, prefix='tts'):
+        """File name keyed on the narration and voice, so the same clip is never synthesized twice"""
+        return f"{prefix}_{TTSCache.make_key(self.clean_text(text), voice)[:16]}.mp3"
+    
+    async def generate_audio(self, text, voice=None, output_filename=None, prefix='tts'):
         """
-        Generate audio from text using Edge TTS
+        Generate audio from text using Edge TTS.
+        Without an output_filename the clip is named after its text and voice
+        (see audio_filename) and an existing one is returned as is.
         """
         if voice is None:
             voice = self.voices[0]  # Default to Jenny
         
         if output_filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"tts_{timestamp}.mp3"
-        
-        output_path = os.path.join(self.audio_dir, output_filename)
+            output_path = os.path.join(self.audio_dir, self.audio_filename(text, voice, prefix))
+            if os.path.exists(output_path):
+                mark_used(output_path)
+                print(f"♻️ Audio reused: {output_path}")
+                return output_path
+        else:
+            output_path = os.path.join(self.audio_dir, output_filename)
         
         try:
-            # Clean text for better TTS
-            clean_text = text.replace('$', ' dollars ').replace('%', ' percent ')
-            communicate = edge_tts.Communicate(clean_text, voice)
-            await communicate.save(output_path)
-            
-            # Verify file was created
-            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                print(f"🎤 Audio generated: {output_path}")
-                return output_path
-            else:
-                print(f"❌ Audio file not created or empty")
-                return None
-                
+            cached = await self._synthesize(text, voice, output_path)
+            print(f"🎤 Audio {'reused from cache' if cached else 'generated'}: {output_path}")
+            return output_path
         except Exception as e:
             print(f"❌ Error generating audio: {e}")
             return None
     
+    async def _synthesize(self, text, voice, output_path):
+        """
+        Synthesize text to output_path, raising if nothing usable was written.
+        Returns True when the clip was served from the TTS cache.
+        """
+        clean_text = self.clean_text(text)
+        
+        # Written under a partial name and renamed into place: a concurrent
+        # reader never sees half a clip, and an old file (possibly hardlinked
+        # into the cache) is replaced rather than written through
+        tmp_path = partial_path(output_path)
+        with span('tts.synthesize', voice=voice, chars=len(clean_text)) as s:
+            try:
+                key = self.cache.make_key(clean_text, voice) if self.cache else None
+                if key and self.cache.fetch(key, tmp_path):
+                    os.replace(tmp_path, output_path)
+                    s.set(cached=True)
+                    return True
+                
+                communicate = self.communicate_factory(clean_text, voice)
+                await communicate.save(tmp_path)
+                
+                # Verify file was created
+                if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+                    raise IOError("Audio file not created or empty")
+                os.replace(tmp_path, output_path)
+                s.bytes_in = os.path.getsize(output_path)
+                s.set(cached=False)
+            finally:
+                if os.path.lexists(tmp_path):
+                    os.remove(tmp_path)
+            
+            if key:
+                self.cache.store(key, output_path)
+            return False
+    
+    async def generate_many(self, items, concurrency=4, timeout=30, retries=2, backoff=1.0):
+        """
+        Synthesize many (text, voice, output_filename) items concurrently on one event loop.
+        
+        Each request gets `timeout` seconds and up to `retries` retries with
+        exponential backoff. Items without an output_filename are named after
+        their text and voice, and existing clips are reused. Returns output
+        paths in input order, None for items that failed every attempt.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def synthesize_one(text, voice, output_filename):
+            voice = voice or self.voices[0]
+            named = output_filename is not None
+            output_filename = output_filename or self.audio_filename(text, voice)
+            output_path = os.path.join(self.audio_dir, output_filename)
+            if not named and os.path.exists(output_path):
+                mark_used(output_path)
+                print(f"♻️ Audio reused: {output_path}")
+                return output_path
+            
+            async with semaphore:
+                with span('tts.request', voice=voice, file=output_filename) as s:
+                    for attempt in range(retries + 1):
+                        try:
+                            cached = await asyncio.wait_for(self._synthesize(text, voice, output_path), timeout)
+                            print(f"🎤 Audio {'reused from cache' if cached else 'generated'}: {output_path}")
+                            return output_path
+                        except Exception as e:
+                            error = str(e) or type(e).__name__
+                            if attempt == retries:
+                                print(f"❌ Error generating audio {output_filename}: {error}")
+                                s.status, s.error = 'error', error
+                                return None
+                            delay = backoff * 2 ** attempt
+                            print(f"⚠️ Retrying {output_filename} in {delay:.1f}s ({error})")
+                            s.retries += 1
+                            await asyncio.sleep(delay)
+        
+        return await asyncio.gather(*(synthesize_one(*item) for item in items))
+    
     def generate_market_summary_script(self, coin_data, top_gainers=None, top_losers=None):
         """
         Generate a script for market summary narration
@@ -104,9 +196,16 @@ class TTSGenerator:
         return script
 
 # Helper function to run async code
-def generate_audio_sync(text, voice=None, output_filename=None):
+def generate_audio_sync(text, voice=None, output_filename=None, prefix='tts'):
     """
     Synchronous wrapper for async audio generation
     """
     tts = TTSGenerator()
-    return asyncio.run(tts.generate_audio(text, voice, output_filename))
\ No newline at end of file
+    return asyncio.run(tts.generate_audio(text, voice, output_filename, prefix))
+
+def generate_many_sync(items, **kwargs):
+    """
+    Synchronous wrapper for TTSGenerator.generate_many on a single event loop
+    """
+    tts = TTSGenerator()
+    return asyncio.run(tts.generate_many(items, **kwargs))
\ No newline at end of file
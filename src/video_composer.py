@@ -1,11 +1,25 @@
 import subprocess
 import os
 import random
-from datetime import datetime
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from src.artifacts import content_key, file_sha256, mark_used, partial_path
+from src.background_library import BackgroundLibrary
+from src.chart_animation import DrawOnAnimation
+from src.encode_profiles import content_tune, encode_args, get_encode_profile, split_cores
+from src.instrumentation import run_command, span
+
 load_dotenv()
 
+# Publishing targets for multi-output composes: (width, height)
+OUTPUT_FORMATS = {
+    'vertical': (1080, 1920),   # 9:16 Shorts / Reels / TikTok
+    'square': (1080, 1080),     # 1:1 feed posts
+    'landscape': (1920, 1080),  # 16:9 YouTube / X
+}
+
 class VideoComposer:
     def __init__(self):
         self.output_dir = os.getenv('OUTPUT_DIR', './assets/output')
@@ -17,10 +31,23 @@ class VideoComposer:
         self.width = int(os.getenv('VIDEO_WIDTH', 1080))
         self.height = int(os.getenv('VIDEO_HEIGHT', 1920))
         
+        # Named x264 settings from src/encode_profiles.py
+        self.encode_profile = os.getenv('ENCODE_PROFILE', 'publish')
+        get_encode_profile(self.encode_profile)
+        # Title font; when missing, drawtext falls back to the fontconfig default
+        self.font_file = os.getenv('FONT_FILE', '/System/Library/Fonts/Helvetica.ttc')
+        # Chart entrance: 'fade' (static PNG, 1s fade-in) or 'draw' (line drawn on over the narration)
+        self.chart_animation = os.getenv('CHART_ANIMATION', 'fade')
+        # Extra aspect ratios encoded from the same composition (e.g. "vertical,square,landscape")
+        self.output_formats = [name.strip() for name in os.getenv('OUTPUT_FORMATS', '').split(',') if name.strip()]
+        
         # Ensure directories exist
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.backgrounds_dir, exist_ok=True)
         
+        # Pre-rendered template backgrounds, looked up per compose
+        self.backgrounds = BackgroundLibrary(self)
+        
     def check_ffmpeg(self):
         """Check if FFmpeg is available"""
         try:
@@ -33,7 +60,8 @@ class VideoComposer:
     
     def create_sample_background(self):
         """Create an animated background with subtle effects"""
-        background_path = os.path.join(self.backgrounds_dir, 'animated_bg.mp4')
+        size = f"{self.width}x{self.height}"
+        background_path = os.path.join(self.backgrounds_dir, f'animated_bg_{size}.mp4')
         
         if os.path.exists(background_path):
             return background_path
@@ -42,9 +70,9 @@ class VideoComposer:
         cmd = [
             'ffmpeg', '-y',
             '-f', 'lavfi',
-            '-i', 'color=black:size=1080x1920:duration=15:rate=30',
+            '-i', f'color=black:size={size}:duration=15:rate=30',
             '-f', 'lavfi',
-            '-i', 'cellauto=c=0:s=1080x1920:m=0:ratio=0.1:f=15',
+            '-i', f'cellauto=c=0:s={size}:m=0:ratio=0.1:f=15',
             '-filter_complex', 
             '[0:v][1:v]blend=all_mode=multiply:all_opacity=0.3[bg1];[bg1]eq=brightness=0.1:contrast=1.2:saturation=1.5[bg]',
             '-map', '[bg]',
@@ -55,7 +83,7 @@ class VideoComposer:
         ]
         
         try:
-            subprocess.run(cmd, check=True, capture_output=True)
+            self.run_ffmpeg(cmd, 'background', background_path, background='animated')
             print(f"✅ Animated background created: {background_path}")
             return background_path
         except subprocess.CalledProcessError as e:
@@ -65,7 +93,8 @@ class VideoComposer:
     
     def create_simple_background(self):
         """Create a simple black background as fallback"""
-        background_path = os.path.join(self.backgrounds_dir, 'simple_bg.mp4')
+        size = f"{self.width}x{self.height}"
+        background_path = os.path.join(self.backgrounds_dir, f'simple_bg_{size}.mp4')
         
         if os.path.exists(background_path):
             return background_path
@@ -73,7 +102,7 @@ class VideoComposer:
         cmd = [
             'ffmpeg', '-y',
             '-f', 'lavfi',
-            '-i', 'color=black:size=1080x1920:duration=15:rate=30',
+            '-i', f'color=black:size={size}:duration=15:rate=30',
             '-c:v', 'libx264',
             '-preset', 'fast',
             '-t', '15',
@@ -81,30 +110,231 @@ class VideoComposer:
         ]
         
         try:
-            subprocess.run(cmd, check=True, capture_output=True)
+            self.run_ffmpeg(cmd, 'background', background_path, background='simple')
             return background_path
         except subprocess.CalledProcessError as e:
             print(f"❌ Error creating background: {e}")
             return None
     
     def compose_video(self, chart_path, audio_path, coin_name, price_change, 
-                      background_path=None, duration=15):
+                      background_path=None, duration=15, output_name=None, background=None,
+                      profile=None, animation=None, outputs=None):
+        """
+        Compose final video with chart, audio, and background.
+        
+        `background` takes a TemplateManager background config (solid or
+        gradient) which is generated inside the filter graph; otherwise the
+        pre-encoded file at `background_path` (or the sample one) is used.
+        `profile` names an encode profile (draft, publish, throughput).
+        `animation` overrides CHART_ANIMATION ('fade' or 'draw').
+        `outputs` (format names from OUTPUT_FORMATS, default OUTPUT_FORMATS env)
+        encodes several aspect ratios in one pass. The primary (first format)
+        path is returned; use compose_formats for every format's path.
+        Without an `output_name` the file is named after its inputs, and a
+        video already composed from the same inputs is returned as is.
+        """
+        return primary_output(self.compose_formats(chart_path, audio_path, coin_name, price_change,
+                                                   background_path, duration, output_name, background,
+                                                   profile=profile, animation=animation, outputs=outputs))
+    
+    def compose_formats(self, chart_path, audio_path, coin_name, price_change,
+                        background_path=None, duration=15, output_name=None, background=None,
+                        profile=None, animation=None, outputs=None):
         """
-        Compose final video with chart, audio, and background
+        compose_video, returning a {format: path} dict when several output
+        formats are encoded (a single path otherwise), or None on failure
         """
         if not self.check_ffmpeg():
             return None
         
-        # Create background if not provided
-        if not background_path:
-            background_path = self.create_sample_background()
-            if not background_path:
+        command = self.build_compose_command(chart_path, audio_path, coin_name, price_change,
+                                             background_path, duration, output_name, background,
+                                             profile=profile, animation=animation, outputs=outputs)
+        if not command:
+            return None
+        cmd, output_path = command
+        if output_name is None and self.outputs_exist(output_path):
+            mark_used(output_path)
+            print(f"♻️ Video reused: {output_path}")
+            return output_path
+        
+        try:
+            print(f"🎬 Composing video...")
+            self.run_ffmpeg(cmd, 'compose', output_path,
+                            input=self.chart_frames(chart_path, audio_path, duration, animation),
+                            coin=coin_name, profile=profile or self.encode_profile)
+            print(f"✅ Video composed successfully: {output_path}")
+            return output_path
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Error composing video: {e}")
+            print(f"FFmpeg stderr: {e.stderr.decode() if e.stderr else 'No stderr'}")
+            return None
+    
+    def compose_many(self, jobs, profile='throughput', parallel=None):
+        """
+        Throughput mode: run several compose jobs at once with the cores split between them.
+        
+        Each job is a dict of compose_video keyword arguments. Returns output
+        paths (the primary one for multi-format jobs) in job order, None for
+        failed jobs.
+        """
+        if not self.check_ffmpeg():
+            return [None] * len(jobs)
+        
+        parallel, threads = split_cores(parallel)
+        print(f"🎬 Composing {len(jobs)} videos, {parallel} at a time with {threads} threads each...")
+        
+        def run(job):
+            command = self.build_compose_command(**dict(job, profile=job.get('profile', profile), threads=threads))
+            if not command:
+                return None
+            cmd, output_path = command
+            if job.get('output_name') is None and self.outputs_exist(output_path):
+                mark_used(output_path)
+                print(f"♻️ Video reused: {output_path}")
+                return output_path
+            try:
+                frames = self.chart_frames(job['chart_path'], job['audio_path'],
+                                           job.get('duration', 15), job.get('animation'))
+                self.run_ffmpeg(cmd, 'compose', output_path, input=frames, coin=job.get('coin_name'),
+                                profile=job.get('profile', profile))
+                return output_path
+            except subprocess.CalledProcessError as e:
+                print(f"❌ Error composing {output_path}: {e}")
+                print(f"FFmpeg stderr: {e.stderr.decode() if e.stderr else 'No stderr'}")
                 return None
         
-        # Generate output filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"{coin_name}_{timestamp}_video.mp4"
-        output_path = os.path.join(self.output_dir, output_filename)
+        with ThreadPoolExecutor(parallel) as pool:
+            return [primary_output(output) for output in pool.map(run, jobs)]
+    
+    def run_ffmpeg(self, cmd, stage, output_path=None, input=None, **attrs):
+        """
+        Run an FFmpeg command in an `ffmpeg.<stage>` span that records wall
+        time, the child's CPU time and the size of the file it wrote.
+        `input` (bytes or an iterable of chunks) is streamed to FFmpeg's stdin.
+        Outputs are written under partial names and renamed into place once
+        FFmpeg succeeds, so an existing output is always a complete one.
+        Raises subprocess.CalledProcessError on failure, like subprocess.run(check=True).
+        """
+        # Multi-output composes pass a {format: path} dict
+        paths = output_path.values() if isinstance(output_path, dict) else [output_path]
+        partials = {path: partial_path(path) for path in paths if path}
+        cmd = [partials.get(arg, arg) for arg in cmd]
+        with span(f"ffmpeg.{stage}", **attrs) as s:
+            try:
+                result = run_command(cmd, span=s, input=input)
+                for path, tmp_path in partials.items():
+                    os.replace(tmp_path, path)
+            finally:
+                for tmp_path in partials.values():
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            s.bytes_in = sum(os.path.getsize(path) for path in partials if os.path.exists(path))
+            return result
+    
+    @staticmethod
+    def outputs_exist(output_path):
+        """Whether every file of a (single or {format: path}) compose output is already on disk"""
+        paths = output_path.values() if isinstance(output_path, dict) else [output_path]
+        return all(os.path.exists(path) for path in paths)
+    
+    def media_duration(self, path):
+        """
+        Duration of an audio/video file in seconds from FFmpeg's probe output, or None
+        """
+        try:
+            result = subprocess.run(['ffmpeg', '-hide_banner', '-i', path], capture_output=True)
+        except FileNotFoundError:
+            return None
+        match = re.search(rb'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', result.stderr)
+        if not match:
+            return None
+        hours, minutes, seconds = match.groups()
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    
+    def chart_frames(self, chart_path, audio_path, duration=15, animation=None):
+        """
+        Raw RGBA frame stream for the 'draw' chart animation (None for 'fade').
+        
+        The line is drawn on over the narration (capped at `duration`); the
+        frames are produced lazily, one at a time, as FFmpeg reads its stdin.
+        """
+        if (animation or self.chart_animation) != 'draw':
+            return None
+        narration = self.media_duration(audio_path) if audio_path else None
+        draw_seconds = min(duration, narration) if narration else duration
+        return DrawOnAnimation(chart_path, 800, 400, duration=draw_seconds, fps=30).frames()
+    
+    def background_source(self, background, duration, fps=30, size=None):
+        """
+        Build a lavfi source for a solid or gradient background template, or None.
+        `size` is (width, height), defaulting to VIDEO_WIDTH x VIDEO_HEIGHT.
+        """
+        width, height = size or (self.width, self.height)
+        size = f"{width}x{height}"
+        if background.get('type') == 'solid':
+            return f"color=c={background['color']}:s={size}:r={fps}:d={duration}"
+        if background.get('type') == 'gradient':
+            colors = background['colors'][:8]
+            stops = ':'.join(f"c{i}={color}" for i, color in enumerate(colors))
+            return (f"gradients=s={size}:r={fps}:d={duration}:n={len(colors)}:{stops}"
+                    f":x0=0:y0=0:x1=0:y1={height}")
+        return None
+    
+    @staticmethod
+    def background_animated(background):
+        """
+        Whether a background moves: only solid templates are static; gradients
+        drift, and video files (the cellauto sample one included) are assumed to
+        """
+        return not (background and background.get('type') == 'solid')
+    
+    def build_compose_command(self, chart_path, audio_path, coin_name, price_change,
+                              background_path=None, duration=15, output_name=None, background=None,
+                              profile=None, threads=None, animation=None, outputs=None):
+        """
+        Build the FFmpeg command for compose_video, returning (cmd, output_path).
+        
+        With the 'draw' animation the chart input is raw RGBA read from stdin
+        (see chart_frames) instead of the looped PNG. With several `outputs`
+        the composition is built once, split, and each branch is scaled and
+        padded to its format and encoded as its own output file; output_path
+        is then a {format: path} dict.
+        """
+        outputs = outputs or self.output_formats
+        for name in outputs:
+            if name not in OUTPUT_FORMATS:
+                raise ValueError(f"Unknown output format: {name} (available: {', '.join(OUTPUT_FORMATS)})")
+
+        # Template backgrounds come from the pre-rendered library; variants that
+        # haven't been rendered are generated in the same filter graph instead
+        lavfi_source = None
+        if background and not background_path:
+            background_path = self.backgrounds.get(background, duration)
+            if not background_path:
+                lavfi_source = self.background_source(background, duration)
+        
+        if lavfi_source:
+            background_input = ['-f', 'lavfi', '-i', lavfi_source]
+        else:
+            # Create background if not provided
+            if not background_path:
+                background_path = self.create_sample_background()
+                if not background_path:
+                    return None
+            background_input = ['-i', background_path]
+        
+        # Generate output filename from everything the video is made of
+        if output_name is None:
+            key = content_key(file_sha256(chart_path), file_sha256(audio_path), coin_name, price_change,
+                              background, background_path, duration, profile or self.encode_profile,
+                              animation or self.chart_animation, outputs, self.width, self.height)
+            output_name = f"{coin_name}_{key}"
+        if outputs:
+            output_path = {name: os.path.join(self.output_dir, f"{output_name}_{name}_video.mp4")
+                           for name in outputs}
+        else:
+            output_path = os.path.join(self.output_dir, f"{output_name}_video.mp4")
         
         # Determine color based on price change
         if price_change >= 0:
@@ -114,46 +344,224 @@ class VideoComposer:
             text_color = '#ff4444'
             emoji = '📉'
         
+        font = f":fontfile={self.font_file}" if os.path.exists(self.font_file) else ''
+        
+        drawn = (animation or self.chart_animation) == 'draw'
+        tune = content_tune(profile or self.encode_profile, drawn or self.background_animated(background))
+        
+        if drawn:
+            # Frames arrive at overlay size; when the stream ends overlay repeats the last one
+            chart_input = ['-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '800x400', '-framerate', '30',
+                           '-i', 'pipe:0']
+            chart_filter = '[1:v]format=rgba[chart_fade]'
+        else:
+            # Chart image, looped so the fade plays over time
+            chart_input = ['-loop', '1', '-framerate', '30', '-i', chart_path]
+            chart_filter = '[1:v]scale=800:400,fade=t=in:st=0:d=1:alpha=1[chart_fade]'
+        
         # FFmpeg command to compose video with working fade animations
         filter_complex = [
             # Background video
-            '[0:v]scale=1080:1920[bg]',
-            # Chart overlay with fade-in
-            f'[1:v]scale=800:400,fade=t=in:st=0:d=1[chart_fade]',
+            f'[0:v]scale={self.width}:{self.height}[bg]',
+            # Chart overlay: fade-in or drawn-on frame stream
+            chart_filter,
             # Compose background and faded chart
             '[bg][chart_fade]overlay=(W-w)/2:(H-h)/2-100[comp1]',
             # Add title without fade to avoid errors
-            f'[comp1]drawtext=text=\'{coin_name.upper()}\':fontcolor=white:fontsize=80:x=(W-w)/2:y=100:fontfile=/System/Library/Fonts/Helvetica.ttc[final]'
+            f'[comp1]drawtext=text=\'{coin_name.upper()}\':fontcolor=white:fontsize=80:x=(W-w)/2:y=100{font}[final]'
         ]
         
+        if outputs:
+            # Decode, overlay and title run once; only scale/pad/encode is per format
+            labels = [f'[out_{name}]' for name in outputs]
+            filter_complex.append(f"[final]split={len(outputs)}{''.join(f'[split_{name}]' for name in outputs)}")
+            for name, label in zip(outputs, labels):
+                width, height = OUTPUT_FORMATS[name]
+                if (width, height) == (self.width, self.height):
+                    filter_complex.append(f'[split_{name}]null{label}')
+                else:
+                    filter_complex.append(
+                        f'[split_{name}]scale={width}:{height}:force_original_aspect_ratio=decrease,'
+                        f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,setsar=1{label}'
+                    )
+            output_args = []
+            for name, label in zip(outputs, labels):
+                output_args += ['-map', label, '-map', '2:a',
+                                *encode_args(profile or self.encode_profile, threads, tune),
+                                '-c:a', 'aac', '-t', str(duration), '-shortest', output_path[name]]
+        else:
+            output_args = [
+                '-map', '[final]',
+                '-map', '2:a',              # Map audio from input 2
+                *encode_args(profile or self.encode_profile, threads, tune),
+                '-c:a', 'aac',
+                '-t', str(duration),
+                '-shortest',                # End when shortest input ends
+                output_path
+            ]
+        
         cmd = [
             'ffmpeg', '-y',
-            '-i', background_path,      # Background video
-            '-i', chart_path,           # Chart image
+            *background_input,          # Background video or lavfi source
+            *chart_input,               # Chart image or frame stream
             '-i', audio_path,           # Audio narration
-            '-filter_complex', ','.join(filter_complex),
-            '-map', '[final]',
-            '-map', '2:a',              # Map audio from input 2
-            '-c:v', 'libx264',
-            '-c:a', 'aac',
-            '-preset', 'fast',
-            '-crf', '23',
-            '-t', str(duration),
-            '-shortest',                # End when shortest input ends
-            output_path
+            '-filter_complex', ';'.join(filter_complex),
+            *output_args
         ]
         
+        return cmd, output_path
+    
+    def compose_roundup(self, segments, title='TOP GAINERS', background=None, background_path=None,
+                        output_name=None, profile=None, crossfade=0.5, gap=0.4):
+        """
+        Compose a multi-coin roundup in a single FFmpeg graph and encode.
+        
+        Each segment is a dict with chart_path, audio_path, coin_name and
+        price_change (plus an optional duration; by default the narration
+        length plus `gap`). Charts and captions are overlaid only during their
+        own segment and crossfade into the next one; the narration clips are
+        padded to their segment length and concatenated. Returns the output
+        path or None; without an `output_name` an existing roundup of the same
+        segments is reused.
+        """
+        if not segments:
+            print("❌ No roundup segments provided")
+            return None
+        if not self.check_ffmpeg():
+            return None
+        
+        command = self.build_roundup_command(segments, title, background, background_path,
+                                             output_name, profile, crossfade=crossfade, gap=gap)
+        if not command:
+            return None
+        cmd, output_path = command
+        if output_name is None and self.outputs_exist(output_path):
+            mark_used(output_path)
+            print(f"♻️ Roundup reused: {output_path}")
+            return output_path
+        
         try:
-            print(f"🎬 Composing video...")
-            subprocess.run(cmd, check=True, capture_output=True)
-            print(f"✅ Video composed successfully: {output_path}")
+            print(f"🎬 Composing {len(segments)}-coin roundup...")
+            self.run_ffmpeg(cmd, 'roundup', output_path, segments=len(segments),
+                            profile=profile or self.encode_profile)
+            print(f"✅ Roundup composed successfully: {output_path}")
             return output_path
         except subprocess.CalledProcessError as e:
-            print(f"❌ Error composing video: {e}")
+            print(f"❌ Error composing roundup: {e}")
             print(f"FFmpeg stderr: {e.stderr.decode() if e.stderr else 'No stderr'}")
             return None
     
-    def create_top_gainers_video(self, gainers_data, duration=15):
+    def build_roundup_command(self, segments, title='TOP GAINERS', background=None, background_path=None,
+                              output_name=None, profile=None, threads=None, crossfade=0.5, gap=0.4):
+        """
+        Build the FFmpeg command for compose_roundup, returning (cmd, output_path)
+        """
+        # Segment timeline: chart i is on screen from its start until `crossfade`
+        # into the next segment, fading out while the next one fades in
+        durations = []
+        for segment in segments:
+            duration = segment.get('duration')
+            if not duration:
+                narration = self.media_duration(segment['audio_path'])
+                duration = (narration or 5) + gap
+            durations.append(round(duration, 3))
+        starts = [round(sum(durations[:i]), 3) for i in range(len(durations))]
+        total = round(sum(durations), 3)
+        count = len(segments)
+        # Charts only fade between segments; motion comes from the background
+        tune = content_tune(profile or self.encode_profile, self.background_animated(background))
+        
+        lavfi_source = None
+        if background and not background_path:
+            background_path = self.backgrounds.get(background, total)
+            if not background_path:
+                lavfi_source = self.background_source(background, total)
+        if lavfi_source:
+            background_input = ['-f', 'lavfi', '-i', lavfi_source]
+        else:
+            if not background_path:
+                background_path = self.create_sample_background()
+                if not background_path:
+                    return None
+            # Library/sample backgrounds are shorter than a roundup: loop them
+            background_input = ['-stream_loop', '-1', '-i', background_path]
+        
+        if output_name is None:
+            key = content_key([(file_sha256(segment['chart_path']), file_sha256(segment['audio_path']),
+                                segment['coin_name'], segment['price_change']) for segment in segments],
+                              durations, title, background, background_path, profile or self.encode_profile,
+                              crossfade, self.width, self.height)
+            output_name = f"roundup_{key}"
+        output_path = os.path.join(self.output_dir, f"{output_name}_video.mp4")
+        
+        font = f":fontfile={self.font_file}" if os.path.exists(self.font_file) else ''
+        chart_inputs, audio_inputs = [], []
+        filter_complex = [f'[0:v]scale={self.width}:{self.height}[bg]']
+        overlays = []
+        audio_labels = []
+        
+        for i, (segment, start, duration) in enumerate(zip(segments, starts, durations)):
+            last = i == count - 1
+            visible = duration if last else duration + crossfade
+            end = round(start + visible, 3)
+            chart_inputs += ['-framerate', '30', '-i', segment['chart_path']]
+            audio_inputs += ['-i', segment['audio_path']]
+            
+            fades = f'fade=t=in:st=0:d={crossfade}:alpha=1'
+            if not last:
+                fades += f',fade=t=out:st={duration}:d={crossfade}:alpha=1'
+            # The PNG is decoded and scaled once; loop repeats that frame on demand
+            # (a looped image input would be decoded ahead and queued for every
+            # segment), then the timestamps are shifted onto the segment's slot
+            frames = int(round(visible * 30))
+            filter_complex.append(f'[{1 + i}:v]scale=800:400,format=rgba,loop=loop={frames - 1}:size=1:start=0,'
+                                  f'setpts=N/30/TB,{fades},setpts=PTS+{start}/TB[chart{i}]')
+            
+            enable = f"enable='between(t,{start},{end})'"
+            fade_in, fade_out = round(start + crossfade, 3), round(start + duration, 3)
+            alpha = (f"alpha='if(lt(t,{fade_in}),(t-{start})/{crossfade},"
+                     f"if(gt(t,{fade_out}),({end}-t)/{crossfade},1))'")
+            change = segment['price_change']
+            change_color = '#00ff88' if change >= 0 else '#ff4444'
+            overlays.append(
+                f"overlay=(W-w)/2:(H-h)/2-100:eof_action=pass:{enable}[chart{i}_on];"
+                f"[chart{i}_on]drawtext=text='#{i + 1} {segment['coin_name'].upper()}':expansion=none"
+                f":fontcolor=white:fontsize=72:x=(W-tw)/2:y=300:{alpha}:{enable}{font},"
+                f"drawtext=text='{change:+.1f}%':expansion=none"
+                f":fontcolor={change_color}:fontsize=96:x=(W-tw)/2:y=(H/2)+200:{alpha}:{enable}{font}"
+            )
+            audio_labels.append(f'[voice{i}]')
+            filter_complex.append(f'[{1 + count + i}:a]aformat=sample_rates=44100:channel_layouts=stereo,'
+                                  f'atrim=end={duration},apad=whole_dur={duration}[voice{i}]')
+        
+        # Chain the per-segment overlays on top of the background
+        previous = '[bg]'
+        for i, overlay in enumerate(overlays):
+            filter_complex.append(f'{previous}[chart{i}]{overlay}[seg{i}]')
+            previous = f'[seg{i}]'
+        filter_complex.append(
+            f"{previous}drawtext=text='{title}':expansion=none:fontcolor=white:fontsize=80"
+            f":x=(W-tw)/2:y=100{font}[final]"
+        )
+        filter_complex.append(f"{''.join(audio_labels)}concat=n={count}:v=0:a=1[narration]")
+        
+        cmd = [
+            'ffmpeg', '-y',
+            *background_input,
+            *chart_inputs,              # One chart image per segment
+            *audio_inputs,              # One narration clip per segment
+            '-filter_complex', ';'.join(filter_complex),
+            '-map', '[final]',
+            '-map', '[narration]',
+            *encode_args(profile or self.encode_profile, threads, tune),
+            '-c:a', 'aac',
+            '-t', str(total),
+            output_path
+        ]
+        
+        return cmd, output_path
+    
+    def create_top_gainers_video(self, gainers_data, duration=15, coingecko=None):
         """
         Create video for top gainers
         """
@@ -169,13 +577,14 @@ class VideoComposer:
         # Generate chart for this coin
         from src.coingecko_api import CoingeckoAPI
         from src.chart_generator import QuickChartGenerator
+        from src.price_history import PriceHistoryProvider
         from src.tts_generator import generate_audio_sync
         
-        coingecko = CoingeckoAPI()
+        history = PriceHistoryProvider(coingecko or CoingeckoAPI())
         chart_gen = QuickChartGenerator()
         
-        # Get price history
-        price_history = coingecko.get_coin_price_history(coin_name, days=7)
+        # Get price history (7-day sparkline already carried by the markets entry)
+        price_history = history.get_history(coin_name, days=7, coin_data=top_gainer)
         if not price_history:
             return None
         
@@ -197,10 +606,69 @@ class VideoComposer:
         
         # Generate audio
         script = f"{top_gainer['name']} is the top performer today, trading at ${top_gainer['current_price']:,.0f}, up {price_change:.1f} percent in the last 24 hours."
-        audio_path = generate_audio_sync(script, output_filename=f"{coin_name}_gainer_audio.mp3")
+        audio_path = generate_audio_sync(script, prefix=f"{coin_name}_gainer")
         
         if not audio_path:
             return None
         
         # Compose video
-        return self.compose_video(chart_path, audio_path, coin_name, price_change, duration=duration)
\ No newline at end of file
+        return self.compose_video(chart_path, audio_path, coin_name, price_change, duration=duration)
+    
+    def create_top_gainers_roundup(self, gainers_data, count=5, coingecko=None, background=None):
+        """
+        Create a roundup video covering the top `count` gainers, one segment per coin
+        """
+        gainers = (gainers_data or [])[:count]
+        if not gainers:
+            print("❌ No gainers data provided")
+            return None
+        
+        from src.coingecko_api import CoingeckoAPI
+        from src.chart_generator import QuickChartGenerator
+        from src.price_history import PriceHistoryProvider
+        from src.tts_generator import generate_many_sync
+        
+        history = PriceHistoryProvider(coingecko or CoingeckoAPI())
+        chart_gen = QuickChartGenerator()
+        
+        # 7-day sparklines ride along with the markets entries
+        coins = []
+        for coin in gainers:
+            price_history = history.get_history(coin['id'], days=7, coin_data=coin)
+            if price_history:
+                coins.append((coin, price_history))
+        if not coins:
+            return None
+        
+        # Every chart in one concurrent batch, every narration clip on one event loop
+        images = chart_gen.render_many([series for _, series in coins],
+                                       price_changes=[coin['price_change_percentage_24h'] for coin, _ in coins])
+        scripts = [
+            (f"Number {rank}: {coin['name']}, trading at ${coin['current_price']:,.2f}, "
+             f"up {coin['price_change_percentage_24h']:.1f} percent in the last 24 hours.",
+             None, None)
+            for rank, (coin, _) in enumerate(coins, start=1)
+        ]
+        audio_paths = generate_many_sync(scripts)
+        
+        segments = []
+        for (coin, _), image, audio_path in zip(coins, images, audio_paths):
+            chart_path = chart_gen.save_chart(image, 'roundup_chart', coin['id']) if image else None
+            if not chart_path or not audio_path:
+                print(f"⚠️ Skipping {coin['id']} in roundup")
+                continue
+            segments.append({
+                'chart_path': chart_path,
+                'audio_path': audio_path,
+                'coin_name': coin.get('symbol') or coin['id'],
+                'price_change': coin['price_change_percentage_24h'],
+            })
+        
+        return self.compose_roundup(segments, title=f"TOP {len(segments)} GAINERS", background=background)
+
+
+def primary_output(output):
+    """The primary video of a compose result: the first format of a {format: path} dict"""
+    if isinstance(output, dict):
+        return next(iter(output.values()), None)
+    return output